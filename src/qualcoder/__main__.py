@@ -300,7 +300,8 @@ class App(object):
 
         self.project_path = project_path
         self.project_name = project_path.split('/')[-1]
-        self.conn = sqlite3.connect(os.path.join(project_path, 'data.qda'))
+        # Larger statement cache, as the coding dialogs repeat many parameterised statements
+        self.conn = sqlite3.connect(os.path.join(project_path, 'data.qda'), cached_statements=256)
         
     def get_project_memo(self) -> str:
         # Might be called from a different thread (ai asynch operations), so have to create a new database connection
@@ -593,20 +594,17 @@ class App(object):
             List of dictionaries of Categories catid, name, memo, date, supercatid, owner
         """
 
+        # Rows are made into dictionaries by the cursor row factory, as they are fetched
         cur = self.conn.cursor()
-        categories = []
+        category_keys = 'name', 'catid', 'owner', 'date', 'memo', 'supercatid'
+        cur.row_factory = lambda cursor, row: dict(zip(category_keys, row))
         cur.execute("select name, catid, owner, date, ifnull(memo,''), supercatid from code_cat order by lower(name)")
-        result = cur.fetchall()
-        keys = 'name', 'catid', 'owner', 'date', 'memo', 'supercatid'
-        for row in result:
-            categories.append(dict(zip(keys, row)))
-        codes = []
+        categories = cur.fetchall()
         cur = self.conn.cursor()
+        code_keys = 'name', 'memo', 'owner', 'date', 'cid', 'catid', 'color'
+        cur.row_factory = lambda cursor, row: dict(zip(code_keys, row))
         cur.execute("select name, ifnull(memo,''), owner, date, cid, catid, color from code_name order by lower(name)")
-        result = cur.fetchall()
-        keys = 'name', 'memo', 'owner', 'date', 'cid', 'catid', 'color'
-        for row in result:
-            codes.append(dict(zip(keys, row)))
+        codes = cur.fetchall()
         return codes, categories
 
     def check_bad_file_links(self):
@@ -2811,6 +2809,14 @@ Click "Yes" to start now.')
         sql += "(select catid from code_cat)"
         cur.execute(sql)
         self.app.conn.commit()
+        # Indexes for the per file and coder lookups of codings and annotations, e.g. when coding text
+        cur.execute("create index if not exists code_text_fid_owner_pos0 on code_text (fid, owner, pos0)")
+        cur.execute("create index if not exists annotation_fid_owner_pos0 on annotation (fid, owner, pos0)")
+        # Indexes for the per code updates and deletes, e.g. merge and delete code.
+        # code_text lookups by cid use the unique(cid,fid,pos0,pos1,owner) index
+        cur.execute("create index if not exists code_av_cid on code_av (cid)")
+        cur.execute("create index if not exists code_image_cid on code_image (cid)")
+        self.app.conn.commit()
         # Vacuum database
         cur.execute("vacuum")
         self.app.conn.commit()
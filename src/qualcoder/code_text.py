@@ -18,19 +18,21 @@ Author: Colin Curtain (ccbogel)
 https://github.com/ccbogel/QualCoder
 """
 
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
 import sqlite3
-from copy import copy, deepcopy
+from copy import copy
 import datetime
 # import difflib  # Slow, kept this in case need to revert to it. Now using diff_match_patch
-import diff_match_patch
+# diff_match_patch, webbrowser, ai and report dialogs are imported in the methods that use them
+from functools import lru_cache
 import html
 import logging
-from operator import itemgetter
 import os
 import qtawesome as qta  # see: https://pictogrammers.com/library/mdi/
-from random import randint
+from random import randint, sample
 import re
-import webbrowser
+import time
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
@@ -44,21 +46,92 @@ from .helpers import Message, DialogGetStartAndEndMarks, ExportDirectoryPathDial
 from .GUI.ui_dialog_code_text import Ui_Dialog_code_text
 from .memo import DialogMemo
 from .report_attributes import DialogSelectAttributeParameters
-from .reports import DialogReportCoderComparisons, DialogReportCodeFrequencies  # For isinstance()
-from .report_codes import DialogReportCodes
-from .report_code_summary import DialogReportCodeSummary  # For isinstance()
 from .select_items import DialogSelectItems  # For isinstance()
 from .speakers import DialogSpeakers
-from .ai_search_dialog import DialogAiSearch
-from .ai_prompts import PromptsList, DialogAiEditPrompts
-from .ai_chat import ai_chat_signal_emitter
 
 ai_search_analysis_max_count = 10  # How many chunks of data are analysed in the second stage
+regex_special_chars = set(".^$*+?{}[]\\|()")  # A search term without these is searched as plain text
 
 path = os.path.abspath(os.path.dirname(__file__))
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=128)
+def cached_icon(name, scale_factor=None):
+    """ Create a qtawesome icon once, then reuse it. Icons are shared across widgets and dialogs.
+    param: name : String icon name, e.g. mdi6.arrow-left
+    param: scale_factor : Float or None
+    returns: QIcon """
+
+    if scale_factor is None:
+        return qta.icon(name)
+    return qta.icon(name, options=[{'scale_factor': scale_factor}])
+
+
+def tree_item_id(item):
+    """ Get the type and id of a code tree item, stored as item data when the tree is filled.
+    The same id is shown as text in column 1, e.g. cid:12 or catid:3
+    param: item : QTreeWidgetItem
+    returns: Tuple of String 'cid' or 'catid' and Integer id """
+
+    return item.data(1, Qt.ItemDataRole.UserRole)
+
+
+def index_by_pos0(code_text):
+    """ Index coded texts by pos0, so the coded texts at a text position are found without scanning them all.
+    Used by DialogCodeText and ToolTipEventFilter, with codings_at_position.
+    param: code_text : List of coded text dictionaries, with pos0 and pos1
+    returns: Tuple of list of code_text indexes sorted by pos0, list of the sorted pos0 values,
+        and Integer length of the longest coded text """
+
+    order_by_pos0 = sorted(range(len(code_text)), key=lambda i: code_text[i]['pos0'])
+    pos0s = [code_text[i]['pos0'] for i in order_by_pos0]
+    max_length = max((c['pos1'] - c['pos0'] for c in code_text), default=0)
+    return order_by_pos0, pos0s, max_length
+
+
+def codings_at_position(code_text, pos0_index, pos):
+    """ Get the coded texts that contain this position.
+    Only coded texts starting within the longest coded text length before the position can contain it.
+    param: code_text : List of coded text dictionaries, with pos0 and pos1
+    param: pos0_index : Tuple from index_by_pos0 for this code_text
+    param: pos : Integer position in the full text
+    returns: List of code_text dictionaries, in code_text order """
+
+    order_by_pos0, pos0s, max_length = pos0_index
+    start = bisect_left(pos0s, pos - max_length)
+    end = bisect_right(pos0s, pos)
+    indexes = [i for i in order_by_pos0[start:end] if code_text[i]['pos1'] >= pos]
+    return [code_text[i] for i in sorted(indexes)]
+
+
+def original_text_path(project_path, mediapath):
+    """ Get the path of the original document of a text file.
+    param: project_path : String
+    param: mediapath : String '/docs/' prefix for internal, 'docs:' prefix for external, or None
+    returns: String path, or None if there is no original document """
+
+    if mediapath is None or len(mediapath) <= 6:
+        return None
+    if mediapath.startswith("/docs/"):
+        return project_path + "/documents/" + mediapath[6:]
+    if mediapath.startswith("docs:"):
+        return mediapath[5:]
+    return None
+
+
+@lru_cache(maxsize=256)
+def code_color_brushes(color):
+    """ Create the background and text brushes for a code colour once, then reuse them.
+    Projects use a small number of code colours, so the cache stays small.
+    param: color : String hex colour, e.g. #FF0000
+    returns: Tuple of background QBrush and foreground QBrush """
+
+    background = QBrush(QColor(color), Qt.BrushStyle.SolidPattern)
+    foreground = QBrush(QColor(TextColor(color).recommendation))
+    return background, foreground
+
+
 class DialogCodeText(QtWidgets.QWidget):
     """ Code management. Add, delete codes. Mark and unmark text.
     Add memos and colors to codes.
@@ -71,13 +144,25 @@ class DialogCodeText(QtWidgets.QWidget):
     app = None
     parent_textEdit = None
     tab_reports = None  # Tab widget reports, used for updates to codes
+    report_trees_pending = False  # Report trees are updated when the hidden reports tab is next shown
     codes = []
-    recent_codes = []  # List of recent codes (up to 5) for textedit context menu
+    codes_by_cid = {}  # Code dictionaries keyed by cid, for fast lookups
+    codes_by_name = {}  # Code dictionaries keyed by code name, for fast lookups
+    categories_by_catid = {}  # Category dictionaries keyed by catid, for fast lookups
+    tree_items_by_cid = {}  # Code tree widget items keyed by cid, filled in fill_tree
+    tree_items_by_catid = {}  # Category tree widget items keyed by catid, filled in fill_tree
+    tree_items_by_code_name = {}  # Code tree widget items keyed by code name, filled in fill_tree
+    code_names_lower = []  # List of tuples of lower case code name and cid, for find_code_in_tree
+    recent_codes = {}  # Recent codes (up to 10) keyed by cid, most recent first, for textedit context menu
     categories = []
     tree_sort_option = "all asc"  # all desc, cat then code asc
-    filenames = []
+    filenames = []  # Id and name of all text files, filled by get_files when all files are listed
+    file_rows_by_name = {}  # List widget row for each file name, filled in get_files
     file_ = None  # Contains filename and file id returned from SelectItems
     code_text = []
+    code_text_pos0_index = ([], [], 0)  # Pos0 index of code_text, from index_by_pos0. See index_code_text
+    code_text_by_cid = {}  # Lists of code_text items sorted by pos0, keyed by cid. For show selected code next/previous
+    code_text_pos0s_by_cid = {}  # Sorted pos0 lists keyed by cid, for bisect
     annotations = []
     undo_deleted_codes = []
 
@@ -90,6 +175,10 @@ class DialogCodeText(QtWidgets.QWidget):
     search_indices = []
     search_index = 0
     search_term = ""
+    search_cache = None  # Tuple of search key and search_indices for the last search, cleared when text changes
+    tree_menu_widget = None  # Code tree context menu, created once by create_tree_menu
+    tree_menu_actions = None  # Dictionary of the code tree context menu actions
+    ctrl_key_actions = {}  # Ctrl + key shortcuts keyed by Qt key, filled in __init__
     selected_code_index = 0
     important = False  # Show/hide important codes
     attributes = []  # Show selected files using these attributes in list widget
@@ -101,8 +190,9 @@ class DialogCodeText(QtWidgets.QWidget):
     autocode_history = []
 
     # Timers to reduce overly sensitive key events: overlap, re-size oversteps by multiple characters
-    code_resize_timer = 0
-    overlap_timer = 0
+    code_resize_timer = 0  # time.monotonic() seconds of the last code resize key event
+    pending_resizes = {}  # ctid: (pos0, pos1, seltext) of resized codings, written by save_resized_codes
+    overlap_timer = 0  # time.monotonic() seconds of the last overlap cycle key press
     text = ""
 
     # Variables for Edit mode, text above also
@@ -110,11 +200,12 @@ class DialogCodeText(QtWidgets.QWidget):
     ed_annotations = []
     ed_casetext = []
     prev_text = ""
-    code_deletions = []
+    code_deletions = []  # List of (sql, values) deletions from edit mode, run when edit mode is saved
     edit_mode = False
     edit_pos = 0
     no_codes_annotes_cases = None
     edit_mode_has_changed = False
+    diff_matcher = None  # diff_match_patch instance, created on first text edit
     # Revert to original if edit text caused problems
     edit_original_source_id = None
     edit_original_source = None
@@ -146,10 +237,12 @@ class DialogCodeText(QtWidgets.QWidget):
         super(DialogCodeText, self).__init__()
         self.app = app
         self.tab_reports = tab_reports
+        # To update report trees that changed while the reports tab was hidden
+        self.tab_reports.installEventFilter(self)
         self.parent_textEdit = parent_textedit
         self.search_indices = []
         self.search_index = 0
-        self.codes, self.categories = self.app.get_codes_categories()
+        self.get_codes_and_categories()
         self.get_recent_codes()  # After codes obtained!
         self.tree_sort_option = "all asc"
         self.annotations = self.app.get_annotations()
@@ -162,8 +255,8 @@ class DialogCodeText(QtWidgets.QWidget):
         self.code_rule = False
         self.important = False
         self.attributes = []
-        self.code_resize_timer = datetime.datetime.now()
-        self.overlap_timer = datetime.datetime.now()
+        self.code_resize_timer = time.monotonic()
+        self.overlap_timer = time.monotonic()
         self.ui = Ui_Dialog_code_text()
         self.ui.setupUi(self)
 
@@ -206,7 +299,51 @@ class DialogCodeText(QtWidgets.QWidget):
         self.ui.textEdit.installEventFilter(self.eventFilterTT)
         self.ui.textEdit.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.ui.textEdit.customContextMenuRequested.connect(self.text_edit_menu)
-        self.ui.textEdit.cursorPositionChanged.connect(self.overlapping_codes_in_text)
+        # Coalesce bursts of cursor moves, e.g. a held arrow key, into one search for overlapping codes
+        self.overlap_debounce_timer = QtCore.QTimer(self)
+        self.overlap_debounce_timer.setSingleShot(True)
+        self.overlap_debounce_timer.setInterval(40)
+        self.overlap_debounce_timer.timeout.connect(self.overlapping_codes_in_text)
+        self.ui.textEdit.cursorPositionChanged.connect(self.overlap_debounce_timer.start)
+        # Commit and redraw extended or shrunk codings once the resize key presses stop
+        self.pending_resizes = {}
+        self.code_resize_save_timer = QtCore.QTimer(self)
+        self.code_resize_save_timer.setSingleShot(True)
+        self.code_resize_save_timer.setInterval(150)
+        self.code_resize_save_timer.timeout.connect(self.save_resized_codes)
+        # Text edit single key shortcuts, see keyPressEvent. Key: (method of the cursor position, selection)
+        self.text_key_actions = {
+            QtCore.Qt.Key.Key_Exclam: (lambda pos: Message(self.app, _("Text position") + " " * 20,
+                                                           _("Character position: ") + str(pos)).exec(), None),
+            QtCore.Qt.Key.Key_Dollar: (lambda pos: self.shift_code_positions(pos + self.file_['start']), None),
+            QtCore.Qt.Key.Key_A: (lambda pos: self.annotate(), True),
+            QtCore.Qt.Key.Key_B: (self.set_bookmark, None),
+            QtCore.Qt.Key.Key_H: (lambda pos: self.ui.groupBox.setHidden(not self.ui.groupBox.isHidden()), None),
+            QtCore.Qt.Key.Key_I: (self.set_important, None),
+            QtCore.Qt.Key.Key_L: (lambda pos: self.show_codes_like(), None),
+            QtCore.Qt.Key.Key_M: (self.coded_text_memo, None),
+            QtCore.Qt.Key.Key_N: (lambda pos: self.mark_with_new_code(False), True),
+            QtCore.Qt.Key.Key_Q: (lambda pos: self.mark(), True),
+            QtCore.Qt.Key.Key_R: (lambda pos: self.text_edit_recent_codes_menu(self.ui.textEdit.cursorRect().topLeft()),
+                                  True),
+            QtCore.Qt.Key.Key_S: (lambda pos: self.ui.lineEdit_search.setFocus(), False),
+            QtCore.Qt.Key.Key_U: (self.unmark, None),
+            QtCore.Qt.Key.Key_V: (lambda pos: self.mark_with_new_code(in_vivo=True), True),
+        }
+        self.ctrl_key_actions = {
+            QtCore.Qt.Key.Key_F: self.ui.lineEdit_search.setFocus,
+            QtCore.Qt.Key.Key_Z: self.undo_last_unmarked_code,
+            QtCore.Qt.Key.Key_1: self.go_to_next_file,
+            QtCore.Qt.Key.Key_2: self.go_to_latest_coded_file,
+            QtCore.Qt.Key.Key_3: self.go_to_bookmark,
+            QtCore.Qt.Key.Key_4: lambda: self.file_memo(self.file_),
+            QtCore.Qt.Key.Key_5: self.get_files_from_attributes,
+            QtCore.Qt.Key.Key_6: self.show_selected_code_in_text_previous,
+            QtCore.Qt.Key.Key_7: self.show_selected_code_in_text_next,
+            QtCore.Qt.Key.Key_8: self.show_all_codes_in_text,
+            QtCore.Qt.Key.Key_9: self.show_important_coded,
+            QtCore.Qt.Key.Key_0: self.help,
+        }
         self.ui.textEdit_info.setReadOnly(True)
         self.ui.listWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.ui.listWidget.customContextMenuRequested.connect(self.file_menu)
@@ -220,64 +357,57 @@ class DialogCodeText(QtWidgets.QWidget):
         self.ui.tabWidget.setCurrentIndex(0)  # Defaults to list of documents
         self.get_files()
 
-        # Buttons under files list
-        self.ui.pushButton_latest.setIcon(qta.icon('mdi6.arrow-collapse-right'))
-        self.ui.pushButton_latest.pressed.connect(self.go_to_latest_coded_file)
-        self.ui.pushButton_next_file.setIcon(qta.icon('mdi6.arrow-right'))
-        self.ui.pushButton_next_file.pressed.connect(self.go_to_next_file)
-        self.ui.pushButton_bookmark_go.setIcon(qta.icon('mdi6.bookmark'))
-        self.ui.pushButton_bookmark_go.pressed.connect(self.go_to_bookmark)
-        self.ui.pushButton_document_memo.setIcon(qta.icon('mdi6.text-long'))
-        self.ui.pushButton_document_memo.pressed.connect(self.active_file_memo)
-        self.ui.pushButton_file_attributes.setIcon(qta.icon('mdi6.variable', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_file_attributes.pressed.connect(self.get_files_from_attributes)
-        # Buttons under codes tree
-        self.ui.pushButton_find_code.setIcon(qta.icon('mdi6.card-search-outline', options=[{'scale-factor': 1.2}]))
-        self.ui.pushButton_find_code.pressed.connect(self.find_code_in_tree)
-        self.ui.pushButton_show_codings_next.setIcon(qta.icon('mdi6.arrow-right'))
-        self.ui.pushButton_show_codings_next.pressed.connect(self.show_selected_code_in_text_next)
-        self.ui.pushButton_show_codings_prev.setIcon(qta.icon('mdi6.arrow-left'))
-        self.ui.pushButton_show_codings_prev.pressed.connect(self.show_selected_code_in_text_previous)
-        self.ui.pushButton_show_all_codings.setIcon(qta.icon('mdi6.text-search'))
-        self.ui.pushButton_show_all_codings.pressed.connect(self.show_all_codes_in_text)
-        self.ui.pushButton_show_all_codings.setIcon(qta.icon('mdi6.text-search', options=[{'scale-factor': 1.2}]))
-        self.ui.pushButton_show_all_codings.pressed.connect(self.show_all_codes_in_text)
-        self.ui.pushButton_important.setIcon(qta.icon('mdi6.star-outline', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_important.pressed.connect(self.show_important_coded)
-        # Right hand side splitter buttons
-        self.ui.pushButton_code_rule.setIcon(qta.icon('mdi6.text-shadow'))
-        self.ui.pushButton_code_rule.pressed.connect(self.show_code_rule)
+        # Buttons: name, icon, icon scale factor, pressed slot
+        buttons = [
+            # Buttons under files list
+            ('pushButton_latest', 'mdi6.arrow-collapse-right', None, self.go_to_latest_coded_file),
+            ('pushButton_next_file', 'mdi6.arrow-right', None, self.go_to_next_file),
+            ('pushButton_bookmark_go', 'mdi6.bookmark', None, self.go_to_bookmark),
+            ('pushButton_document_memo', 'mdi6.text-long', None, self.active_file_memo),
+            ('pushButton_file_attributes', 'mdi6.variable', 1.3, self.get_files_from_attributes),
+            # Buttons under codes tree
+            ('pushButton_find_code', 'mdi6.card-search-outline', 1.2, self.find_code_in_tree),
+            ('pushButton_show_codings_next', 'mdi6.arrow-right', None, self.show_selected_code_in_text_next),
+            ('pushButton_show_codings_prev', 'mdi6.arrow-left', None, self.show_selected_code_in_text_previous),
+            ('pushButton_show_all_codings', 'mdi6.text-search', 1.2, self.show_all_codes_in_text),
+            ('pushButton_important', 'mdi6.star-outline', 1.3, self.show_important_coded),
+            # Right hand side splitter buttons
+            ('pushButton_code_rule', 'mdi6.text-shadow', None, self.show_code_rule),
+            ('pushButton_project_memo', 'mdi6.file-document-outline', None, self.show_project_memo),
+            # Header buttons
+            ('pushButton_annotate', 'mdi6.text-box-edit-outline', 1.3, self.annotate),
+            ('pushButton_show_annotations', 'mdi6.text-search-variant', 1.3, self.show_annotations),
+            ('pushButton_coding_memo', 'mdi6.text-box-edit', 1.3, self.coded_text_memo),
+            ('pushButton_show_memos', 'mdi6.text-search', 1.3, self.show_memos),
+            ('pushButton_mark_speakers', 'mdi6.pin-outline', 1.3, self.mark_speakers),
+            ('pushButton_auto_code_frag_this_file', 'mdi6.magic-staff', None, self.auto_code_sentences),
+            ('pushButton_auto_code_surround', 'mdi6.spear', None, self.button_autocode_surround),
+            ('pushButton_auto_code_undo', 'mdi6.undo', None, self.undo_autocoding),
+            ('pushButton_default_new_code_color', 'mdi6.palette', 1.3, self.set_default_new_code_color),
+            # Search buttons
+            ('pushButton_previous', 'mdi6.arrow-left', 1.3, self.move_to_previous_search_text),
+            ('pushButton_next', 'mdi6.arrow-right', 1.3, self.move_to_next_search_text),
+            ('pushButton_help', 'mdi6.help', None, self.help),
+            ('pushButton_right_side_pane', 'mdi6.arrow-expand-left', 1.3, self.show_right_side_pane),
+            ('pushButton_delete_all_codes', 'mdi6.delete-outline', 1.4, self.delete_all_codes_from_file),
+            # Edit mode buttons
+            ('pushButton_edit', 'mdi6.text-box-edit-outline', 1.3, self.edit_mode_toggle),
+            ('pushButton_exit_edit', 'mdi6.text-box-check-outline', 1.3, self.edit_mode_toggle),
+            ('pushButton_undo_edit', 'mdi6.undo', 1.3, self.undo_edited_text),
+        ]
+        for button_name, icon_name, scale_factor, slot in buttons:
+            button = getattr(self.ui, button_name)
+            button.setIcon(cached_icon(icon_name, scale_factor))
+            button.pressed.connect(slot)
         self.ui.pushButton_journal.hide()
-        self.ui.pushButton_project_memo.setIcon(qta.icon('mdi6.file-document-outline'))
-        self.ui.pushButton_project_memo.pressed.connect(self.show_project_memo)
         self.ui.textEdit_info.tabChangesFocus()
-        # Header buttons
-        self.ui.pushButton_annotate.setIcon(qta.icon('mdi6.text-box-edit-outline', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_annotate.pressed.connect(self.annotate)
-        self.ui.pushButton_show_annotations.setIcon(
-            qta.icon('mdi6.text-search-variant', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_show_annotations.pressed.connect(self.show_annotations)
-        self.ui.pushButton_coding_memo.setIcon(qta.icon('mdi6.text-box-edit', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_coding_memo.pressed.connect(self.coded_text_memo)
-        self.ui.pushButton_show_memos.setIcon(qta.icon('mdi6.text-search', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_show_memos.pressed.connect(self.show_memos)
-        self.ui.pushButton_mark_speakers.setIcon(qta.icon('mdi6.pin-outline', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_mark_speakers.pressed.connect(self.mark_speakers)
-        self.ui.pushButton_auto_code.setIcon(qta.icon('mdi6.mace'))
+        self.ui.pushButton_auto_code.setIcon(cached_icon('mdi6.mace'))
         self.ui.pushButton_auto_code.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.ui.pushButton_auto_code.customContextMenuRequested.connect(self.button_auto_code_menu)
         self.ui.pushButton_auto_code.clicked.connect(self.auto_code)
-        self.ui.pushButton_auto_code_frag_this_file.setIcon(qta.icon('mdi6.magic-staff'))
         self.ui.pushButton_auto_code_frag_this_file.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.ui.pushButton_auto_code_frag_this_file.customContextMenuRequested.connect(self.button_auto_code_frag_menu)
-        self.ui.pushButton_auto_code_frag_this_file.pressed.connect(self.auto_code_sentences)
-        self.ui.pushButton_auto_code_surround.setIcon(qta.icon('mdi6.spear'))
-        self.ui.pushButton_auto_code_surround.pressed.connect(self.button_autocode_surround)
-        self.ui.pushButton_auto_code_undo.setIcon(qta.icon('mdi6.undo'))
-        self.ui.pushButton_auto_code_undo.pressed.connect(self.undo_autocoding)
-        self.ui.pushButton_default_new_code_color.setIcon(qta.icon('mdi6.palette', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_default_new_code_color.pressed.connect(self.set_default_new_code_color)
-        self.ui.label_exports.setPixmap(qta.icon('mdi6.export').pixmap(22, 22))
+        self.ui.label_exports.setPixmap(cached_icon('mdi6.export').pixmap(22, 22))
 
         self.ui.lineEdit_search.textEdited.connect(self.search_for_text)
         self.ui.lineEdit_search.setEnabled(False)
@@ -285,32 +415,20 @@ class DialogCodeText(QtWidgets.QWidget):
         self.ui.checkBox_search_all_files.setEnabled(False)
         self.ui.checkBox_search_case.stateChanged.connect(self.search_for_text)
         self.ui.checkBox_search_case.setEnabled(False)
-        self.ui.label_search_regex.setPixmap(qta.icon('mdi6.help').pixmap(22, 22))
-        self.ui.label_search_case_sensitive.setPixmap(qta.icon('mdi6.format-letter-case').pixmap(22, 22))
-        self.ui.label_search_all_files.setPixmap(qta.icon('mdi6.text-box-multiple-outline').pixmap(22, 22))
-        self.ui.label_font_size.setPixmap(qta.icon('mdi6.format-size').pixmap(22, 22))
-        self.ui.pushButton_previous.setIcon(qta.icon('mdi6.arrow-left', options=[{'scale_factor': 1.3}]))
+        self.ui.label_search_regex.setPixmap(cached_icon('mdi6.help').pixmap(22, 22))
+        self.ui.label_search_case_sensitive.setPixmap(cached_icon('mdi6.format-letter-case').pixmap(22, 22))
+        self.ui.label_search_all_files.setPixmap(cached_icon('mdi6.text-box-multiple-outline').pixmap(22, 22))
+        self.ui.label_font_size.setPixmap(cached_icon('mdi6.format-size').pixmap(22, 22))
         self.ui.pushButton_previous.setEnabled(False)
-        self.ui.pushButton_next.setIcon(qta.icon('mdi6.arrow-right', options=[{'scale_factor': 1.3}]))
         self.ui.pushButton_next.setEnabled(False)
-        self.ui.pushButton_next.pressed.connect(self.move_to_next_search_text)
-        self.ui.pushButton_previous.pressed.connect(self.move_to_previous_search_text)
-        self.ui.pushButton_help.setIcon(qta.icon('mdi6.help'))
-        self.ui.pushButton_help.pressed.connect(self.help)
-        self.ui.pushButton_right_side_pane.setIcon(qta.icon('mdi6.arrow-expand-left', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_right_side_pane.pressed.connect(self.show_right_side_pane)
-        self.ui.pushButton_delete_all_codes.setIcon(qta.icon('mdi6.delete-outline', options=[{'scale_factor': 1.4}]))
-        self.ui.pushButton_delete_all_codes.pressed.connect(self.delete_all_codes_from_file)
-        self.ui.pushButton_edit.setIcon(qta.icon('mdi6.text-box-edit-outline', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_edit.pressed.connect(self.edit_mode_toggle)
-        self.ui.pushButton_exit_edit.setIcon(qta.icon('mdi6.text-box-check-outline', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_exit_edit.pressed.connect(self.edit_mode_toggle)
-        self.ui.pushButton_undo_edit.setIcon(qta.icon('mdi6.undo', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_undo_edit.pressed.connect(self.undo_edited_text)
         self.ui.label_codes_count.setEnabled(False)
         self.ui.treeWidget.setDragEnabled(True)
         self.ui.treeWidget.setAcceptDrops(True)
         self.ui.treeWidget.setDragDropMode(QtWidgets.QAbstractItemView.DragDropMode.InternalMove)
+        # All rows use the same font, so row heights are not measured per item
+        self.ui.treeWidget.setUniformRowHeights(True)
+        self.ui.treeWidget.setWordWrap(False)
+        self.ui.treeWidget.setAnimated(False)
         self.ui.treeWidget.viewport().installEventFilter(self)
         self.ui.treeWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.ui.treeWidget.customContextMenuRequested.connect(self.tree_menu)
@@ -339,42 +457,61 @@ class DialogCodeText(QtWidgets.QWidget):
         self.ui.splitter.splitterMoved.connect(self.update_sizes)
         self.ui.leftsplitter.splitterMoved.connect(self.update_sizes)
 
-        # Add paragraph numbers widget
+        # Paragraph numbers widget is added when the first file is loaded, see init_number_bar
+        self.number_bar = None
+        self.fill_tree()
+        # These signals after the tree is filled the first time
+        self.ui.treeWidget.itemCollapsed.connect(self.get_collapsed)
+        self.ui.treeWidget.itemExpanded.connect(self.get_collapsed)
+
+        # AI search. The widgets are set up when the AI tab is first selected, see init_ai_search_ui
+        self.ai_search_ui_ready = False
+        self.ai_search_listview_action_label = None
+        self.ui.ai_progressBar.setVisible(False)
+        self.ai_search_spinner_sequence = ['', '.', '..', '...']
+        self.ai_search_spinner_index = 0
+        self.ai_search_spinner_timer = None
+        self.ai_search_prompt = None
+        self.ai_search_ai_model = None
+        self.ai_search_found = False
+        self.ai_include_coded_segments = None
+        self.ai_search_analysis_counter = 0
+
+    def init_number_bar(self):
+        """ Add the paragraph numbers widget, on first use.
+        Called by: load_file """
+
+        if self.number_bar is not None:
+            return
         self.number_bar = NumberBar(self.ui.textEdit)
         layout = QtWidgets.QVBoxLayout(self.ui.lineNumbers)
         layout.setContentsMargins(0, 0, 0, 0)  # Remove margins if needed
         layout.addWidget(self.number_bar)
         self.ui.lineNumbers.setLayout(layout)
-        self.fill_tree()
-        # These signals after the tree is filled the first time
-        self.ui.treeWidget.itemCollapsed.connect(self.get_collapsed)
-        self.ui.treeWidget.itemExpanded.connect(self.get_collapsed)
 
-        # AI search
+    def init_ai_search_ui(self):
+        """ Connect the AI search widgets and create the spinner timer, on first use of the AI tab.
+        Called by: tab_changed """
+
+        if self.ai_search_ui_ready:
+            return
         self.ui.pushButton_ai_search.pressed.connect(self.ai_search_clicked)
         self.ui.listWidget_ai.selectionModel().selectionChanged.connect(self.ai_search_selection_changed)
-        self.ai_search_listview_action_label = None
         self.ui.listWidget_ai.clicked.connect(self.ai_search_list_clicked)
-        self.ui.ai_progressBar.setVisible(False)
         self.ui.ai_progressBar.setStyleSheet(f"""
             QProgressBar::chunk {{
                 background-color: {self.app.highlight_color()};
             }}
         """)
-        self.ai_search_spinner_sequence = ['', '.', '..', '...']
-        self.ai_search_spinner_index = 0
         self.ai_search_spinner_timer = QtCore.QTimer(self)
         self.ai_search_spinner_timer.timeout.connect(self.ai_search_update_spinner)
-        self.ai_search_prompt = None
-        self.ai_search_ai_model = None
-        self.ai_search_found = False
-        self.ai_include_coded_segments = None
-        self.ai_search_analysis_counter = 0
+        self.ai_search_ui_ready = True
 
     @staticmethod
     def help():
         """ Open help for transcribe section in browser. """
 
+        import webbrowser
         url = "https://github.com/ccbogel/QualCoder/wiki/4.1.-Coding-Text"
         webbrowser.open(url)
 
@@ -401,7 +538,12 @@ class DialogCodeText(QtWidgets.QWidget):
         """ Combobox font size changed, range: 8 - 22 points. """
 
         font = f'font: {self.ui.comboBox_fontsize.currentText()}pt "{self.app.settings["font"]}";'
+        if font == self.ui.textEdit.styleSheet():
+            return
+        # Style sheet is used, as the dialog style sheet font would override QTextEdit.setFont
+        self.ui.textEdit.setUpdatesEnabled(False)
         self.ui.textEdit.setStyleSheet(font)
+        self.ui.textEdit.setUpdatesEnabled(True)
 
     def find_code_in_tree(self):
         """ Find a code by name in the codes tree and select it.
@@ -424,20 +566,13 @@ class DialogCodeText(QtWidgets.QWidget):
         # Remove selections and search for matching item text
         self.ui.treeWidget.setCurrentItem(None)
         self.ui.treeWidget.clearSelection()
-        item = None
-        iterator = QtWidgets.QTreeWidgetItemIterator(self.ui.treeWidget)
-        while iterator.value():
-            item = iterator.value()
-            if "cid" in item.text(1):
-                cid = int(item.text(1)[4:])
-                code_ = next((code_ for code_ in self.codes if code_['cid'] == cid), None)
-                if search_text in code_['name']:
-                    self.ui.treeWidget.setCurrentItem(item)
-                    break
-            iterator += 1
+        search_text = search_text.lower()
+        cid = next((cid for name, cid in self.code_names_lower if search_text in name), None)
+        item = self.tree_items_by_cid.get(cid)
         if item is None:
             Message(self.app, _("Match not found"), _("No code with matching text found.")).exec()
             return
+        self.ui.treeWidget.setCurrentItem(item)
         # Expand parents
         parent = item.parent()
         while parent is not None:
@@ -449,7 +584,7 @@ class DialogCodeText(QtWidgets.QWidget):
         recent codes are stored as space delimited text in project table.
         Add code id to recent codes list, if code is present. """
 
-        self.recent_codes = []
+        self.recent_codes = {}
         cur = self.app.conn.cursor()
         cur.execute("select recently_used_codes from project")
         res = cur.fetchone()
@@ -458,14 +593,8 @@ class DialogCodeText(QtWidgets.QWidget):
         if res[0] == "" or res[0] is None:
             return
         recent_codes_text = res[0].split()
-        for code_id in recent_codes_text:
-            try:
-                cid = int(code_id)
-                for code_ in self.codes:
-                    if cid == code_['cid']:
-                        self.recent_codes.append(code_)
-            except ValueError:
-                pass
+        recent_cids = [int(code_id) for code_id in recent_codes_text if code_id.isdigit()]
+        self.recent_codes = {cid: self.codes_by_cid[cid] for cid in recent_cids if cid in self.codes_by_cid}
 
     def get_collapsed(self, item):
         """ On category collapse or expansion signal, find the collapsed parent category items.
@@ -473,12 +602,14 @@ class DialogCodeText(QtWidgets.QWidget):
         other areas of the app. """
 
         #print(item.text(0), item.text(1), "Expanded:", item.isExpanded())
-        if item.text(1)[:3] == "cid":
+        item_type, id_ = item.data(1, Qt.ItemDataRole.UserRole) or (None, None)
+        if item_type == "cid":
             return
-        if not item.isExpanded() and item.text(1) not in self.app.collapsed_categories:
-            self.app.collapsed_categories.append(item.text(1))
-        if item.isExpanded() and item.text(1) in self.app.collapsed_categories:
-            self.app.collapsed_categories.remove(item.text(1))
+        catid_text = f"catid:{id_}"  # Same as the column 1 text
+        if not item.isExpanded() and catid_text not in self.app.collapsed_categories:
+            self.app.collapsed_categories.append(catid_text)
+        if item.isExpanded() and catid_text in self.app.collapsed_categories:
+            self.app.collapsed_categories.remove(catid_text)
 
     def get_files(self, ids=None, sort="name asc"):
         """ Get files with additional details and fill list widget.
@@ -490,34 +621,37 @@ class DialogCodeText(QtWidgets.QWidget):
 
         if ids is None:
             ids = []
-        self.ui.listWidget.clear()
         self.files = self.app.get_text_filenames(ids)
+        if not ids:
+            # All text files, kept for show_files_like and file_menu
+            self.filenames = [{'id': f['id'], 'name': f['name']} for f in self.files]
+        self.search_cache = None
         # Fill additional details about each file in the memo
+        # Batch the queries over all listed files, rather than several queries per file
+        file_ids = [file_['id'] for file_ in self.files]
+        file_details = self.get_files_characters_and_codings(file_ids)
+        cases = {}
         cur = self.app.conn.cursor()
-        sql_length = "select length(fulltext), fulltext from source where id=?"
-        sql_codings = "select count(cid) from code_text where fid=? and owner=?"
-        sql_case = "SELECT group_concat(cases.name) from cases join case_text on case_text.caseid=cases.caseid " \
-                   "where case_text.fid=?"
+        for i in range(0, len(file_ids), 500):
+            chunk_ids = file_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk_ids))
+            cur.execute("SELECT case_text.fid, group_concat(cases.name) from cases join case_text on "
+                        f"case_text.caseid=cases.caseid where case_text.fid in ({placeholders}) "
+                        "group by case_text.fid", chunk_ids)
+            cases.update(cur.fetchall())
         for file_ in self.files:
-            cur.execute(sql_length, [file_['id'], ])
-            res_length = cur.fetchone()
-            if res_length is None:  # Safety catch
-                res_length = [0, ""]
+            characters, codings = file_details.get(file_['id'], (0, 0))  # Safety catch
             tt = _("Date: ") + file_['date'].split()[0] + "\n"  # Date without timestamp
-            cur.execute(sql_case, [file_['id']])
-            res_cases = cur.fetchone()
             file_['case'] = ""
-            if res_cases and res_cases[0] is not None:
-                tt += _("Case: ") + str(res_cases[0]) + "\n"
-                file_['case'] = str(res_cases[0])
-            tt += _("Characters: ") + str(res_length[0])
-            file_['characters'] = res_length[0]
+            if cases.get(file_['id']) is not None:
+                tt += _("Case: ") + str(cases[file_['id']]) + "\n"
+                file_['case'] = str(cases[file_['id']])
+            tt += _("Characters: ") + str(characters)
+            file_['characters'] = characters
             file_['start'] = 0
-            file_['end'] = res_length[0]
-            file_['fulltext'] = res_length[1]
-            cur.execute(sql_codings, [file_['id'], self.app.settings['codername']])
-            res_codings = cur.fetchone()
-            tt += f'\n{_("Codings:")} {res_codings[0]}'
+            file_['end'] = characters
+            # fulltext is loaded on demand, see get_file_fulltext
+            tt += f'\n{_("Codings:")} {codings}'
             tt += f"\n{_('From:')} {file_['start']} - {file_['end']}"
             if file_['memo'] != "":
                 tt += f"\nMemo: {file_['memo']}"
@@ -535,15 +669,58 @@ class DialogCodeText(QtWidgets.QWidget):
             self.files = sorted(self.files, key=lambda x: x['date'])
         if sort == "date desc":
             self.files = sorted(self.files, key=lambda x: x['date'], reverse=True)
-        # Fill list widget
-        for file_ in self.files:
-            item = QtWidgets.QListWidgetItem(file_['name'])
-            item.setToolTip(file_['tooltip'])
-            self.ui.listWidget.addItem(item)
+        # Fill list widget. Block selection signals and repaint once, after all items are added
+        self.file_rows_by_name = {}
+        self.ui.listWidget.setUpdatesEnabled(False)
+        with QtCore.QSignalBlocker(self.ui.listWidget.selectionModel()):
+            self.ui.listWidget.clear()
+            for row, file_ in enumerate(self.files):
+                item = QtWidgets.QListWidgetItem(file_['name'])
+                item.setToolTip(file_['tooltip'])
+                self.ui.listWidget.addItem(item)
+                self.file_rows_by_name[file_['name']] = row
+        self.ui.listWidget.setUpdatesEnabled(True)
         self.file_ = None
         self.code_text = []  # Must be before clearing textEdit, as next calls cursorChanged
+        self.index_code_text()
         self.ui.textEdit.setText("")
 
+    def get_file_fulltext(self, file_):
+        """ Load the fulltext into the file dictionary, if not already loaded.
+        The fulltext is not loaded by get_files, to avoid reading every text when filling the list widget.
+        Called by: prev_chars, next_chars, code position changes.
+        load_file also keeps the fulltext in the file dictionary.
+        param: file_ : dictionary of name, id, memo, characters, start, end
+        returns: String fulltext
+        """
+
+        if file_.get('fulltext') is None:
+            file_['fulltext'] = self.app.get_text_fulltext(file_['id'])
+        return file_['fulltext']
+
+    def get_files_characters_and_codings(self, file_ids):
+        """ Get the number of characters and the number of codings by this coder, for each file.
+        One query per batch of file ids, with a correlated count of the codings of each file.
+        Called by: get_files, update_file_tooltip
+        param: file_ids : List of Integer file ids
+        returns: Dictionary of file id: (characters, codings)
+        """
+
+        file_details = {}
+        cur = self.app.conn.cursor()
+        # Batches of 500 ids plus the owner stay under the 999 sql variable limit of older sqlite versions
+        for i in range(0, len(file_ids), 500):
+            chunk_ids = file_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk_ids))
+            # Correlated count, so each file's codings are counted with the code_text (fid, owner, pos0) index
+            sql = "select source.id, length(source.fulltext), " \
+                  "(select count(cid) from code_text where fid=source.id and owner=?) from source " \
+                  f"where source.id in ({placeholders})"
+            cur.execute(sql, [self.app.settings['codername']] + chunk_ids)
+            for row in cur.fetchall():
+                file_details[row[0]] = (row[1], row[2])
+        return file_details
+
     def update_file_tooltip(self):
         """ Create tooltip for file containing characters, codings and from: to: if partially loaded.
         Called by get_files, updates to add, remove codings, text edits.
@@ -551,26 +728,19 @@ class DialogCodeText(QtWidgets.QWidget):
 
         if self.file_ is None:
             return
-        cur = self.app.conn.cursor()
-        sql = "select length(fulltext), fulltext from source where id=?"
-        cur.execute(sql, [self.file_['id'], ])
-        res = cur.fetchone()
-        if res is None:  # Safety catch
-            res = [0, ""]
-        tt = _("Characters: ") + str(res[0])
-        file_size = {'characters': res[0], 'start': 0, 'end': res[0], 'fulltext': res[1]}
-        sql_codings = "select count(cid) from code_text where fid=? and owner=?"
-        cur.execute(sql_codings, [self.file_['id'], self.app.settings['codername']])
-        res = cur.fetchone()
-        tt += f"\n{_('Codings:')} {res[0]}"
+        characters, codings = self.get_files_characters_and_codings([self.file_['id']]).get(
+            self.file_['id'], (0, 0))  # Safety catch
+        tt = _("Characters: ") + str(characters)
+        file_size = {'characters': characters, 'start': 0, 'end': characters}
+        tt += f"\n{_('Codings:')} {codings}"
         tt += f"\n{_('From:')} {file_size['start']} - {file_size['end']}"
         if self.file_['memo'] != "":
             tt += f"\nMemo: {self.file_['memo']}"
         # Find item to update tooltip
-        items = self.ui.listWidget.findItems(self.file_['name'], Qt.MatchFlag.MatchExactly)
-        if len(items) == 0:
+        row = self.file_rows_by_name.get(self.file_['name'])
+        if row is None:
             return
-        items[0].setToolTip(tt)
+        self.ui.listWidget.item(row).setToolTip(tt)
 
     def get_files_from_attributes(self):
         """ Select files based on attribute selections.
@@ -583,28 +753,28 @@ class DialogCodeText(QtWidgets.QWidget):
         self.ui.pushButton_file_attributes.setToolTip(_("Attributes"))
         ui = DialogSelectAttributeParameters(self.app)
         ui.fill_parameters(self.attributes)
-        temp_attributes = deepcopy(self.attributes)
+        temp_attributes = list(self.attributes)  # Shallow copy, the attribute items are not modified
         self.attributes = []
         ok = ui.exec()
         if not ok:
             self.attributes = temp_attributes
-            self.ui.pushButton_file_attributes.setIcon(qta.icon('mdi6.variable', options=[{'scale_factor': 1.3}]))
+            self.ui.pushButton_file_attributes.setIcon(cached_icon('mdi6.variable', 1.3))
             self.ui.pushButton_file_attributes.setToolTip(_("Attributes"))
             if self.attributes:
-                self.ui.pushButton_file_attributes.setIcon(qta.icon('mdi6.variable-box', options=[{'scale_factor': 1.3}]))
+                self.ui.pushButton_file_attributes.setIcon(cached_icon('mdi6.variable-box', 1.3))
             return
         self.attributes = ui.parameters
         if len(self.attributes) == 1:  # Boolean parameter, no attributes
-            self.ui.pushButton_file_attributes.setIcon(qta.icon('mdi6.variable', options=[{'scale_factor': 1.3}]))
+            self.ui.pushButton_file_attributes.setIcon(cached_icon('mdi6.variable', 1.3))
             self.ui.pushButton_file_attributes.setToolTip(_("Attributes"))
             self.get_files()
             return
         if not ui.result_file_ids:
             Message(self.app, _("Nothing found") + " " * 20, _("No matching files found")).exec()
-            self.ui.pushButton_file_attributes.setIcon(qta.icon('mdi6.variable', options=[{'scale_factor': 1.3}]))
+            self.ui.pushButton_file_attributes.setIcon(cached_icon('mdi6.variable', 1.3))
             self.ui.pushButton_file_attributes.setToolTip(_("Attributes"))
             return
-        self.ui.pushButton_file_attributes.setIcon(qta.icon('mdi6.variable-box', options=[{'scale_factor': 1.3}]))
+        self.ui.pushButton_file_attributes.setIcon(cached_icon('mdi6.variable-box', 1.3))
         self.ui.pushButton_file_attributes.setToolTip(ui.tooltip_msg)
         self.get_files(ui.result_file_ids)
 
@@ -629,159 +799,195 @@ class DialogCodeText(QtWidgets.QWidget):
             return
         # Extra to fill right-hand side splitter details
         self.show_code_rule()
-        if current.text(1)[0:3] == 'cat':
-            self.ui.label_code.hide()
-            self.ui.label_code.setToolTip("")
+        if not self.fill_code_label(current):
             return
-        self.ui.label_code.show()
-        # Set background colour of label to code color, and store current code for underlining
-        for c in self.codes:
-            if int(current.text(1)[4:]) == c['cid']:
-                fg_color = TextColor(c['color']).recommendation
-                style = f"QLabel {{background-color:{c['color']}; color: {fg_color};}}"
-                self.ui.label_code.setStyleSheet(style)
-                self.ui.label_code.setAutoFillBackground(True)
-                tt = f"{c['name']}\n"
-                if c['memo'] != "":
-                    tt += _("Memo: ") + c['memo']
-                self.ui.label_code.setToolTip(tt)
-                break
         selected_text = self.ui.textEdit.textCursor().selectedText()
         if len(selected_text) > 0:
             self.mark()
         # When a code is selected undo the show selected code features
         self.highlight()
         # Reload button icons as they disappear on Windows
-        self.ui.pushButton_show_codings_prev.setIcon(qta.icon('mdi6.arrow-left', options=[{'scale_factor': 1.3}]))
-        self.ui.pushButton_show_codings_next.setIcon(qta.icon('mdi6.arrow-right', options=[{'scale_factor': 1.3}]))
+        self.ui.pushButton_show_codings_prev.setIcon(cached_icon('mdi6.arrow-left', 1.3))
+        self.ui.pushButton_show_codings_next.setIcon(cached_icon('mdi6.arrow-right', 1.3))
+
+    def fill_code_label(self, current):
+        """ Set the code label colour and tooltip for the current tree item.
+        With no current item the label is reset to its initial state, for other items it is hidden.
+        Called by: fill_code_label_with_selected_code, fill_tree
+        param: current : QTreeWidgetItem or None
+        returns: True if the current item is a code """
+
+        if current is None:
+            self.ui.label_code.show()
+            self.ui.label_code.setStyleSheet("")
+            self.ui.label_code.setToolTip(_("Right click below to create new codes and categories"))
+            return False
+        item_type, id_ = current.data(1, Qt.ItemDataRole.UserRole) or (None, None)
+        if item_type != "cid":
+            self.ui.label_code.hide()
+            self.ui.label_code.setToolTip("")
+            return False
+        self.ui.label_code.show()
+        # Set background colour of label to code color, and store current code for underlining
+        c = self.codes_by_cid.get(id_)
+        if c is not None:
+            fg_color = code_color_brushes(c['color'])[1].color().name()
+            style = f"QLabel {{background-color:{c['color']}; color: {fg_color};}}"
+            self.ui.label_code.setStyleSheet(style)
+            self.ui.label_code.setAutoFillBackground(True)
+            tt = f"{c['name']}\n"
+            if c['memo'] != "":
+                tt += _("Memo: ") + c['memo']
+            self.ui.label_code.setToolTip(tt)
+        return True
 
     def fill_tree(self):
         """ Fill tree widget, top level items are main categories and unlinked codes.
         The Count column counts the number of times that code has been used by selected coder in selected file.
         Keep record of non-expanded items, then re-enact these items when treee fill is called again. """
 
-        cats = deepcopy(self.categories)
-        codes = deepcopy(self.codes)
-        self.ui.treeWidget.clear()
-        self.ui.treeWidget.setColumnCount(4)
-        self.ui.treeWidget.setHeaderLabels([_("Name"), _("Id"), _("Memo"), _("Count")])
-        self.ui.treeWidget.header().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Interactive)
-        self.ui.treeWidget.header().resizeSection(0, 400)
-        if not self.app.settings['showids']:
-            self.ui.treeWidget.setColumnHidden(1, True)
-        else:
-            self.ui.treeWidget.setColumnHidden(1, False)
-        self.ui.treeWidget.header().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.ResizeToContents)
-        self.ui.treeWidget.header().setStretchLastSection(False)
-        # Add top level categories
-        remove_list = []
-        for c in cats:
-            if c['supercatid'] is None:
+        # Block tree signals and repaint once, after all items are added
+        self.ui.treeWidget.setUpdatesEnabled(False)
+        with QtCore.QSignalBlocker(self.ui.treeWidget):
+            self.ui.treeWidget.clear()
+            self.tree_items_by_cid = {}
+            self.tree_items_by_code_name = {}
+            self.code_names_lower = [(c['name'].lower(), c['cid']) for c in self.codes]
+            self.ui.treeWidget.setColumnCount(4)
+            self.ui.treeWidget.setHeaderLabels([_("Name"), _("Id"), _("Memo"), _("Count")])
+            self.ui.treeWidget.header().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Interactive)
+            self.ui.treeWidget.header().resizeSection(0, 400)
+            if not self.app.settings['showids']:
+                self.ui.treeWidget.setColumnHidden(1, True)
+            else:
+                self.ui.treeWidget.setColumnHidden(1, False)
+            self.ui.treeWidget.header().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.ResizeToContents)
+            self.ui.treeWidget.header().setStretchLastSection(False)
+            # Category and code items are placed by catid lookup, not by iterating the tree
+            # Items are collected per parent, then added with addTopLevelItems and addChildren
+            self.tree_items_by_catid = {}
+            top_level_items = []
+            child_items_by_catid = {}
+            # Top level categories
+            child_cats = []
+            for c in self.categories:
+                if c['supercatid'] is not None:
+                    child_cats.append(c)
+                    continue
                 memo = ""
                 if c['memo'] != "":
                     memo = _("Memo")
                 top_item = QtWidgets.QTreeWidgetItem([c['name'], 'catid:' + str(c['catid']), memo])
+                top_item.setData(1, Qt.ItemDataRole.UserRole, ("catid", c['catid']))
                 top_item.setToolTip(2, c['memo'])
                 top_item.setToolTip(0, '')
                 if len(c['name']) > 52:
                     top_item.setText(0, f"{c['name'][:25]}..{c['name'][-25:]}")
                     top_item.setToolTip(0, c['name'])
-                self.ui.treeWidget.addTopLevelItem(top_item)
-                if f"catid:{c['catid']}" in self.app.collapsed_categories:
-                    top_item.setExpanded(False)
-                else:
-                    top_item.setExpanded(True)
-                remove_list.append(c)
-        for item in remove_list:
-            cats.remove(item)
-        ''' Add child categories. look at each unmatched category, iterate through tree
-         to add as child, then remove matched categories from the list '''
-        count = 0
-        while len(cats) > 0 and count < 10000:
-            remove_list = []
-            for c in cats:
-                it = QtWidgets.QTreeWidgetItemIterator(self.ui.treeWidget)
-                item = it.value()
-                count2 = 0
-                while item and count2 < 10000:  # while there is an item in the list
-                    if item.text(1) == f"catid:{c['supercatid']}":
-                        memo = ""
-                        if c['memo'] != "":
-                            memo = _("Memo")
-                        child = QtWidgets.QTreeWidgetItem([c['name'], f"catid:{c['catid']}", memo])
-                        child.setToolTip(2, c['memo'])
-                        child.setToolTip(0, '')
-                        if len(c['name']) > 52:
-                            child.setText(0, f"{c['name'][:25]}..{c['name'][-25:]}")
-                            child.setToolTip(0, c['name'])
-                        item.addChild(child)
-                        if f"catid:{c['catid']}" in self.app.collapsed_categories:
-                            child.setExpanded(False)
-                        else:
-                            child.setExpanded(True)
-                        remove_list.append(c)
-                    it += 1
-                    item = it.value()
-                    count2 += 1
-            for item in remove_list:
-                cats.remove(item)
-            count += 1
-        # Add unlinked codes as top level items
-        remove_items = []
-        for c in codes:
-            if c['catid'] is None:
-                memo = ""
-                if c['memo'] != "":
-                    memo = _("Memo")
-                top_item = QtWidgets.QTreeWidgetItem([c['name'], f"cid:{c['cid']}", memo])
-                top_item.setToolTip(2, c['memo'])
-                top_item.setToolTip(0, c['name'])
-                if len(c['name']) > 52:
-                    top_item.setText(0, f"{c['name'][:25]}..{c['name'][-25:]}")
-                    top_item.setToolTip(0, c['name'])
-                top_item.setBackground(0, QBrush(QColor(c['color']), Qt.BrushStyle.SolidPattern))
-                color = TextColor(c['color']).recommendation
-                top_item.setForeground(0, QBrush(QColor(color)))
-                top_item.setFlags(
-                    Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsUserCheckable |
-                    Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsDragEnabled)
-                self.ui.treeWidget.addTopLevelItem(top_item)
-                remove_items.append(c)
-        for item in remove_items:
-            codes.remove(item)
-        # Add codes as children
-        for c in codes:
-            it = QtWidgets.QTreeWidgetItemIterator(self.ui.treeWidget)
-            item = it.value()
-            count = 0
-            while item and count < 10000:
-                if item.text(1) == f"catid:{c['catid']}":
+                top_level_items.append(top_item)
+                self.tree_items_by_catid[c['catid']] = top_item
+            ''' Child categories. Each pass places the categories whose parent category has an item.
+             Stop when no category could be placed, e.g. orphaned categories. '''
+            while len(child_cats) > 0:
+                unplaced_cats = []
+                for c in child_cats:
+                    if c['supercatid'] not in self.tree_items_by_catid:
+                        unplaced_cats.append(c)
+                        continue
                     memo = ""
                     if c['memo'] != "":
                         memo = _("Memo")
-                    child = QtWidgets.QTreeWidgetItem([c['name'], f"cid:{c['cid']}", memo])
+                    child = QtWidgets.QTreeWidgetItem([c['name'], f"catid:{c['catid']}", memo])
+                    child.setData(1, Qt.ItemDataRole.UserRole, ("catid", c['catid']))
                     child.setToolTip(2, c['memo'])
-                    child.setToolTip(0, c['name'])
+                    child.setToolTip(0, '')
                     if len(c['name']) > 52:
                         child.setText(0, f"{c['name'][:25]}..{c['name'][-25:]}")
                         child.setToolTip(0, c['name'])
-                    child.setBackground(0, QBrush(QColor(c['color']), Qt.BrushStyle.SolidPattern))
-                    color = TextColor(c['color']).recommendation
-                    child.setForeground(0, QBrush(QColor(color)))
-                    child.setFlags(
-                        Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsUserCheckable |
-                        Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsDragEnabled)
-                    item.addChild(child)
-                    c['catid'] = -1  # Make unmatchable
-                it += 1
-                item = it.value()
-                count += 1
-        # self.ui.treeWidget.expandAll()
+                    child_items_by_catid.setdefault(c['supercatid'], []).append(child)
+                    self.tree_items_by_catid[c['catid']] = child
+                if len(unplaced_cats) == len(child_cats):
+                    break
+                child_cats = unplaced_cats
+            # Unlinked codes are top level items, other codes are children of their category
+            for c in self.codes:
+                if c['catid'] is not None and c['catid'] not in self.tree_items_by_catid:
+                    continue
+                code_item = self.code_tree_item(c)
+                if c['catid'] is None:
+                    top_level_items.append(code_item)
+                else:
+                    child_items_by_catid.setdefault(c['catid'], []).append(code_item)
+            sorting_enabled = self.ui.treeWidget.isSortingEnabled()
+            self.ui.treeWidget.setSortingEnabled(False)
+            for catid, child_items in child_items_by_catid.items():
+                self.tree_items_by_catid[catid].addChildren(child_items)
+            self.ui.treeWidget.addTopLevelItems(top_level_items)
+            # Items can only be expanded once they are in the tree
+            # Expand all in one call, then collapse the few categories the user had collapsed
+            self.ui.treeWidget.expandAll()
+            for catid_text in self.app.collapsed_categories:
+                # Collapsed categories are stored as the column 1 text, e.g. catid:3
+                if not catid_text.startswith("catid:"):
+                    continue
+                item = self.tree_items_by_catid.get(int(catid_text[6:]))
+                if item is not None:
+                    item.setExpanded(False)
+            self.ui.treeWidget.setSortingEnabled(sorting_enabled)
+            self.sort_tree()
+            self.fill_code_counts_in_tree()
+        self.ui.treeWidget.setUpdatesEnabled(True)
+        # clear() does not emit currentItemChanged under the signal blocker, so the label may show a removed code
+        self.fill_code_label(self.ui.treeWidget.currentItem())
+
+    def code_tree_item(self, code_):
+        """ Create the tree widget item for a code and add it to tree_items_by_cid and tree_items_by_code_name.
+        Called by: fill_tree, add_code
+        param: code_ : Dictionary of code
+        returns: QTreeWidgetItem """
+
+        memo = ""
+        if code_['memo'] != "":
+            memo = _("Memo")
+        code_item = QtWidgets.QTreeWidgetItem([code_['name'], f"cid:{code_['cid']}", memo])
+        code_item.setData(1, Qt.ItemDataRole.UserRole, ("cid", code_['cid']))
+        self.tree_items_by_cid[code_['cid']] = code_item
+        self.tree_items_by_code_name[code_['name']] = code_item
+        code_item.setToolTip(2, code_['memo'])
+        self.set_tree_item_name(code_item, code_['name'])
+        background, foreground = code_color_brushes(code_['color'])
+        code_item.setBackground(0, background)
+        code_item.setForeground(0, foreground)
+        code_item.setFlags(
+            Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsUserCheckable |
+            Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsDragEnabled)
+        return code_item
+
+    @staticmethod
+    def set_tree_item_name(item, name):
+        """ Show the code name in the tree item, long names are shortened in the middle.
+        The full name is in the tooltip.
+        param: item : QTreeWidgetItem
+        param: name : String """
+
+        item.setText(0, name)
+        item.setToolTip(0, name)
+        if len(name) > 52:
+            item.setText(0, f"{name[:25]}..{name[-25:]}")
+
+    def sort_tree(self):
+        """ Sort the tree by name for the all asc and all desc sort options.
+        For the cat and code asc option the tree order comes from the order items are added in fill_tree.
+        Called by: fill_tree, add_code, rename_category_or_code
+        returns: True if the tree was sorted, otherwise False """
+
         if self.tree_sort_option == "all asc":
             self.ui.treeWidget.sortByColumn(0, QtCore.Qt.SortOrder.AscendingOrder)
+            return True
         if self.tree_sort_option == "all desc":
             self.ui.treeWidget.sortByColumn(0, QtCore.Qt.SortOrder.DescendingOrder)
-        self.fill_code_counts_in_tree()
+            return True
+        return False
 
     def fill_code_counts_in_tree(self):
         """ Calculate the frequency of each code and category for this coder and the selected file.
@@ -794,74 +1000,47 @@ class DialogCodeText(QtWidgets.QWidget):
         ai_assisted_coding = self.ui.tabWidget.currentIndex() == 1
         if self.file_ is None:
             return
+        # One grouped query for all codes, rather than one query per code
+        parameters = [self.app.settings['codername']]
+        sql = "select code_text.cid, code_name.catid, count(code_text.cid) from code_text join code_name " \
+              "on code_name.cid=code_text.cid where code_text.owner=?"
+        if not ai_assisted_coding:  # documents
+            sql += " and code_text.fid=?"
+            parameters.append(self.file_['id'])
+        sql += " group by code_text.cid"
         cur = self.app.conn.cursor()
-        code_counts = []
-        for c in self.codes:
-            parameters = [c['cid'], self.app.settings['codername']]
-            if ai_assisted_coding:
-                sql = "select code_name.catid, count(code_text.cid) from code_text join code_name " \
-                      "on code_name.cid=code_text.cid where code_text.cid=? and code_text.owner=?"
-            else:  # documents
-                sql = "select code_name.catid, count(code_text.cid) from code_text join code_name " \
-                      "on code_name.cid=code_text.cid where code_text.cid=? and code_text.owner=? " \
-                       "and code_text.fid=?"
-                parameters.append(self.file_['id'])
-            cur.execute(sql, parameters)
-            result = cur.fetchone()
-            code_counts.append([c['cid'], result[0], result[1]])
-        categories = deepcopy(self.categories)
-        # Set up category counts
-        for category in categories:
-            category['count'] = 0
-        # Add the number of codes directly under each category to the category
-        for category in categories:
-            for code in code_counts:
-                if code[1] == category['catid']:
-                    category['count'] += code[2]
-        # Find leaf categories, add to above categories, and gradually remove leaves
-        # until only top categories are left
-        sub_categories = copy(categories)
-        counter = 0
-        while len(sub_categories) > 0 or counter < 10000:
-            leaf_list = []
-            branch_list = []
-            for cat in sub_categories:
-                for cat2 in sub_categories:
-                    if cat['catid'] == cat2['supercatid']:
-                        branch_list.append(cat)
-            for category in sub_categories:
-                if category not in branch_list:
-                    leaf_list.append(category)
-            # Add totals higher category
-            for leaf_category in leaf_list:
-                for category in categories:
-                    if category['catid'] == leaf_category['supercatid']:
-                        category['count'] += leaf_category['count']
-                sub_categories.remove(leaf_category)
-            counter += 1
+        cur.execute(sql, parameters)
+        code_counts = [[row[0], row[1], row[2]] for row in cur.fetchall()]
+        # Add each code count to its category and to every higher category
+        supercatids = {category['catid']: category['supercatid'] for category in self.categories}
+        category_counts = dict.fromkeys(supercatids, 0)
+        for cid, catid, count in code_counts:
+            visited = set()
+            while catid in category_counts and catid not in visited:
+                category_counts[catid] += count
+                visited.add(catid)
+                catid = supercatids[catid]
 
         # Fill tree item counts
-        iterator = QtWidgets.QTreeWidgetItemIterator(self.ui.treeWidget)
-        while iterator.value():
-            item = iterator.value()
-            if item.text(1).startswith("catid"):
-                catid = int(item.text(1)[6:])
-                for category in categories:
-                    if catid == category['catid']:
-                        item.setText(3, str(category['count']))
-            else:
-                cid = int(item.text(1)[4:])
-                for code in code_counts:
-                    if cid == code[0]:
-                        item.setText(3, str(code[2]))
-                        break
-            iterator += 1  # Move to the next item
+        counts_by_cid = {code[0]: code[2] for code in code_counts}
+        with QtCore.QSignalBlocker(self.ui.treeWidget):
+            for cid, item in self.tree_items_by_cid.items():
+                item.setText(3, str(counts_by_cid.get(cid, 0)))
+            for catid, item in self.tree_items_by_catid.items():
+                item.setText(3, str(category_counts.get(catid, 0)))
 
     def get_codes_and_categories(self):
         """ Called from init, delete category/code.
-        Also called on other coding dialogs in the dialog_list. """
+        Also called on other coding dialogs in the dialog_list.
+        Also fills codes_by_cid, codes_by_name and categories_by_catid, for code and category lookups,
+        and refreshes recent_codes. """
 
         self.codes, self.categories = self.app.get_codes_categories()
+        self.codes_by_cid = {c['cid']: c for c in self.codes}
+        self.codes_by_name = {c['name']: c for c in self.codes}
+        self.categories_by_catid = {c['catid']: c for c in self.categories}
+        # Recent codes refer to the reloaded codes, deleted and merged codes are removed
+        self.recent_codes = {cid: self.codes_by_cid[cid] for cid in self.recent_codes if cid in self.codes_by_cid}
 
     # Right Hand Side splitter details for code rule, project memo
     def show_code_rule(self):
@@ -875,25 +1054,30 @@ class DialogCodeText(QtWidgets.QWidget):
         self.code_rule = True
         self.ui.label_info.setText(selected.text(0))
         txt = ""
-        if selected.text(1)[0:3] == 'cat':
-            for c in self.categories:
-                if c['catid'] == int(selected.text(1)[6:]):
-                    txt += c['memo']
-                    break
+        item_type, item_id = tree_item_id(selected)
+        if item_type == 'catid':
+            catid = item_id
+            if catid in self.categories_by_catid:
+                txt += self.categories_by_catid[catid]['memo']
         else:  # Code is selected
-            for c in self.codes:
-                if c['cid'] == int(selected.text(1)[4:]):
-                    txt += c['memo']
-                    break
+            cid = item_id
+            if cid in self.codes_by_cid:
+                txt += self.codes_by_cid[cid]['memo']
             self.ui.textEdit_info.show()
             # Get coded examples
             txt += "\n\n" + _("Examples:") + "\n"
+            # Sample 3 coded text ids, then fetch only those texts, instead of ordering all texts by random()
             cur = self.app.conn.cursor()
-            cur.execute("select seltext from code_text where length(seltext) > 0 and cid=? order by random() limit 3",
-                        [int(selected.text(1)[4:])])
-            res = cur.fetchall()
-            for i, r in enumerate(res):
-                txt += f"{i + 1}: {r[0]}\n"
+            cur.execute("select ctid from code_text where length(seltext) > 0 and cid=?", [cid])
+            ctids = [row[0] for row in cur.fetchall()]
+            sample_ctids = sample(ctids, min(3, len(ctids)))
+            seltexts = {}
+            if sample_ctids:
+                placeholders = ",".join("?" * len(sample_ctids))
+                cur.execute(f"select ctid, seltext from code_text where ctid in ({placeholders})", sample_ctids)
+                seltexts = dict(cur.fetchall())
+            for i, ctid in enumerate(sample_ctids):
+                txt += f"{i + 1}: {seltexts[ctid]}\n"
         self.ui.textEdit_info.setReadOnly(True)
         self.ui.textEdit_info.blockSignals(True)
         self.ui.textEdit_info.setText(txt)
@@ -966,29 +1150,98 @@ class DialogCodeText(QtWidgets.QWidget):
         if pattern is None:
             return
         self.search_indices = []
-        if self.ui.checkBox_search_all_files.isChecked():
-            """ Search for this text across all files. """
-            for filedata in self.app.get_file_texts():
-                try:
-                    text_ = filedata['fulltext']
-                    for match in pattern.finditer(text_):
-                        self.search_indices.append((filedata, match.start(), len(match.group(0))))
-                except re.error:
-                    logger.exception('Failed searching text %s for %s', filedata['name'], self.search_term)
+        all_files = self.ui.checkBox_search_all_files.isChecked()
+        # For the current file, the key includes the loaded text section, as only self.text is searched
+        file_section = None
+        if not all_files:
+            file_section = (self.file_['id'], self.file_['start'], self.file_['end'])
+        search_key = (self.search_term, flags, all_files, file_section)
+        if self.search_cache is not None and self.search_cache[0] == search_key:
+            self.search_indices = list(self.search_cache[1])
+        elif self.search_extends_last_search(search_key):
+            """ The term extends the last plain text search term, so matches can only be at
+            the last search match positions. Check those positions rather than searching all the text. """
+            end = None
+            for filedata, start, length in self.search_cache[1]:
+                if end is not None and filedata is self.search_indices[-1][0] and start < end:
+                    continue
+                text_ = filedata['fulltext'] if all_files else self.text
+                match = pattern.match(text_, start)
+                if match is not None:
+                    self.search_indices.append((filedata, start, match.end() - start))
+                    end = match.end()
+        elif all_files:
+            """ Search for this text across all files.
+            Load one file text at a time, only files with matches are kept in search_indices. """
+            cur = self.app.conn.cursor()
+            cur.execute("select id from source where fulltext is not null order by name")
+            file_ids = [row[0] for row in cur.fetchall()]
+            for file_id in file_ids:
+                for filedata in self.app.get_file_texts([file_id]):
+                    try:
+                        for start, length in self.search_text_matches(pattern, filedata['fulltext']):
+                            self.search_indices.append((filedata, start, length))
+                    except re.error:
+                        logger.exception('Failed searching text %s for %s', filedata['name'], self.search_term)
         else:
             try:
                 if self.text:
-                    for match in pattern.finditer(self.text):
-                        # Get result as first dictionary item
-                        source_name = self.app.get_file_texts([self.file_['id'], ])[0]
-                        self.search_indices.append((source_name, match.start(), len(match.group(0))))
+                    # Get result as first dictionary item
+                    source_name = self.app.get_file_texts([self.file_['id'], ])[0]
+                    for start, length in self.search_text_matches(pattern, self.text):
+                        self.search_indices.append((source_name, start, length))
             except re.error:
                 logger.exception('Failed searching current file for %s', self.search_term)
+        self.search_cache = (search_key, list(self.search_indices))
         if len(self.search_indices) > 0:
             self.ui.pushButton_next.setEnabled(True)
             self.ui.pushButton_previous.setEnabled(True)
         self.ui.label_search_totals.setText(f"0 / {len(self.search_indices)}")
 
+    def search_extends_last_search(self, search_key):
+        """ Check if this search only adds characters to the end of the last search term.
+        Both terms must be plain text, without regex special characters, and use the same search options.
+        The last term must not be able to overlap itself, e.g. 'aa', so that the last search
+        found every position where the longer term can start.
+        Called by: search_for_text
+        param: search_key : Tuple of search term, re flags, all files boolean,
+            tuple of file id, start and end of the loaded text, or None for all files
+        returns: Boolean """
+
+        if self.search_cache is None:
+            return False
+        last_term = self.search_cache[0][0]
+        term = search_key[0]
+        if self.search_cache[0][1:] != search_key[1:] or last_term == "" or not term.startswith(last_term):
+            return False
+        if regex_special_chars.intersection(term):
+            return False
+        if search_key[1] & re.IGNORECASE:
+            last_term = last_term.casefold()
+        return not any(last_term.endswith(last_term[:i]) for i in range(1, len(last_term)))
+
+    @staticmethod
+    def search_text_matches(pattern, text_):
+        """ Find the non-overlapping matches of the compiled search pattern in the text.
+        A case-sensitive search term without regex special characters is found with str.find,
+        which is faster than the regex engine for plain text.
+        Called by: search_for_text
+        param: pattern : compiled re Pattern
+        param: text_ : String text to search
+        returns: List of tuples of match start position and match length """
+
+        term = pattern.pattern
+        if term != "" and pattern.flags & re.IGNORECASE == 0 and not regex_special_chars.intersection(term):
+            matches = []
+            length = len(term)
+            start = text_.find(term)
+            while start != -1:
+                matches.append((start, length))
+                start = text_.find(term, start + length)
+            return matches
+        # Match length from the span, rather than creating the matched substring
+        return [(start, end - start) for start, end in map(re.Match.span, pattern.finditer(text_))]
+
     def move_to_next_search_text(self):
         """ Push button pressed to move to next search text position. """
 
@@ -1167,7 +1420,7 @@ class DialogCodeText(QtWidgets.QWidget):
         Shows a list of recent codes to select from.
         Called by R key press in the text edit pane, only if there is some selected text. """
 
-        if self.ui.textEdit.toPlainText() == "":
+        if self.ui.textEdit.document().isEmpty():
             return
         selected_text = self.ui.textEdit.textCursor().selectedText()
         if selected_text == "":
@@ -1175,20 +1428,20 @@ class DialogCodeText(QtWidgets.QWidget):
         if len(self.recent_codes) == 0:
             return
         menu = QtWidgets.QMenu()
-        for item in self.recent_codes:
+        for item in self.recent_codes.values():
             menu.addAction(item['name'])
         action = menu.exec(self.ui.textEdit.mapToGlobal(position))
         if action is None:
             return
         # Remaining actions will be the submenu codes
-        self.recursive_set_current_item(self.ui.treeWidget.invisibleRootItem(), action.text())
+        self.set_current_code_item(action.text())
         self.mark()
 
     def text_edit_menu(self, position):
         """ Context menu for textEdit.
         Mark, unmark, annotate, copy, memo coded, coded importance. """
 
-        if self.ui.textEdit.toPlainText() == "" or self.edit_mode:
+        if self.ui.textEdit.document().isEmpty() or self.edit_mode:
             return
         cursor = self.ui.textEdit.cursorForPosition(position)
         selected_text = self.ui.textEdit.textCursor().selectedText()
@@ -1212,25 +1465,24 @@ class DialogCodeText(QtWidgets.QWidget):
         submenu_ai_text_analysis = None
 
         # Can have multiple coded text at this position
-        for item in self.code_text:
-            if cursor.position() + self.file_['start'] >= item['pos0'] and cursor.position() <= item['pos1']:
-                action_unmark = QtGui.QAction(_("Unmark (U)"))
-                action_code_memo = QtGui.QAction(_("Memo coded text (M)"))
-                action_start_pos = QtGui.QAction(_("Change start position (SHIFT LEFT/ALT RIGHT)"))
-                action_end_pos = QtGui.QAction(_("Change end position (SHIFT RIGHT/ALT LEFT)"))
-                # action_change_pos = QtGui.QAction(_("Change code position key presses"))
-                if item['important'] is None or item['important'] > 1:
-                    action_important = QtGui.QAction(_("Add important mark (I)"))
-                if item['important'] == 1:
-                    action_not_important = QtGui.QAction(_("Remove important mark"))
-                action_change_code = QtGui.QAction(_("Change code"))
+        for item in self.codes_at_position(cursor.position() + self.file_['start']):
+            action_unmark = QtGui.QAction(_("Unmark (U)"))
+            action_code_memo = QtGui.QAction(_("Memo coded text (M)"))
+            action_start_pos = QtGui.QAction(_("Change start position (SHIFT LEFT/ALT RIGHT)"))
+            action_end_pos = QtGui.QAction(_("Change end position (SHIFT RIGHT/ALT LEFT)"))
+            # action_change_pos = QtGui.QAction(_("Change code position key presses"))
+            if item['important'] is None or item['important'] > 1:
+                action_important = QtGui.QAction(_("Add important mark (I)"))
+            if item['important'] == 1:
+                action_not_important = QtGui.QAction(_("Remove important mark"))
+            action_change_code = QtGui.QAction(_("Change code"))
         if selected_text != "":
             if self.ui.treeWidget.currentItem() is not None:
                 action_mark = menu.addAction(_("Mark (Q)"))
             # Use up to 10 recent codes
             if len(self.recent_codes) > 0:
                 submenu = menu.addMenu(_("Mark with recent code (R)"))
-                for item in self.recent_codes:
+                for item in self.recent_codes.values():
                     submenu.addAction(item['name'])
             action_new_code = menu.addAction(_("Mark with new code (N)"))
             action_new_invivo_code = menu.addAction(_("in vivo code (V)"))
@@ -1261,6 +1513,7 @@ class DialogCodeText(QtWidgets.QWidget):
             submenu_ai_text_analysis.setToolTipsVisible(True)
             if self.app.ai is not None and self.app.ai.is_ready():
                 submenu_ai_text_analysis.setEnabled(True)
+                from .ai_prompts import PromptsList
                 prompts_list = PromptsList(self.app, 'text_analysis')
                 for prompt in prompts_list.prompts:
                     ac = submenu_ai_text_analysis.addAction(prompt.name_and_scope())
@@ -1340,6 +1593,7 @@ class DialogCodeText(QtWidgets.QWidget):
                 return
             selected_text = self.ui.textEdit.textCursor().selectedText()
             start_pos = self.ui.textEdit.textCursor().selectionStart() + self.file_['start']
+            from .ai_chat import ai_chat_signal_emitter
             ai_chat_signal_emitter.newTextChatSignal.emit(int(self.file_['id']),
                                                           self.file_['name'],
                                                           selected_text,
@@ -1347,11 +1601,12 @@ class DialogCodeText(QtWidgets.QWidget):
                                                           action.data())
             return
         if action.property('submenu') == 'ai_text_analysis_prompts':
+            from .ai_prompts import DialogAiEditPrompts
             ui = DialogAiEditPrompts(self.app, 'text_analysis')
             ui.exec()
             return
         # Remaining actions will be the submenu codes
-        self.recursive_set_current_item(self.ui.treeWidget.invisibleRootItem(), action.text())
+        self.set_current_code_item(action.text())
         self.mark()
 
     def change_code_start_or_end_position(self, position, start_or_end):
@@ -1363,11 +1618,9 @@ class DialogCodeText(QtWidgets.QWidget):
 
         if self.file_ is None:
             return
-        coded_list = []
-        for item in self.code_text:
-            if item['pos0'] <= position + self.file_['start'] <= item['pos1'] and \
-                    item['owner'] == self.app.settings['codername']:
-                coded_list.append(item)
+        coder = self.app.settings['codername']
+        coded_list = [item for item in self.codes_at_position(position + self.file_['start'])
+                      if item['owner'] == coder]
         if not coded_list:
             return
         code_ = []
@@ -1383,10 +1636,8 @@ class DialogCodeText(QtWidgets.QWidget):
         if not code_:
             return
 
-        cur = self.app.conn.cursor()
-        length_sql = "select length(fulltext) from source where id=?"
-        cur.execute(length_sql, [self.file_['id']])
-        fulltext_length = cur.fetchone()[0]
+        fulltext = self.get_file_fulltext(self.file_)
+        fulltext_length = len(fulltext)
         title = f"Adjust code {start_or_end}"
         adjustment, ok = QtWidgets.QInputDialog.getInt(self, title, code_['name'])
         if not ok:
@@ -1403,9 +1654,8 @@ class DialogCodeText(QtWidgets.QWidget):
                 code_['pos1'] = code_['pos0'] + 1
             if code_['pos1'] > fulltext_length:
                 code_['pos1'] = fulltext_length - 1
-        text_sql = "select substr(fulltext,?,?), length(fulltext) from source where id=?"
-        cur.execute(text_sql, [code_['pos0'], code_['pos1'], self.file_['id']])
-        seltext = cur.fetchone()[0]
+        seltext = fulltext[code_['pos0']:code_['pos1']]
+        cur = self.app.conn.cursor()
         sql = "update code_text set pos0=?, pos1=?, seltext=? where ctid=?"
         cur.execute(sql, [code_['pos0'], code_['pos1'], seltext, code_['ctid']])
         self.app.conn.commit()
@@ -1421,27 +1671,23 @@ class DialogCodeText(QtWidgets.QWidget):
         # Get selected category, if any
         tree_item = self.ui.treeWidget.currentItem()
         catid = None
-        if tree_item is not None and tree_item.text(1)[0:3] == 'cat':
-            catid = int(tree_item.text(1)[6:])
-        codes_copy = deepcopy(self.codes)
+        if tree_item is not None and tree_item_id(tree_item)[0] == 'catid':
+            catid = tree_item_id(tree_item)[1]
+        old_cids = {c['cid'] for c in self.codes}
         if not in_vivo:
             self.add_code(catid)
         else:
             self.add_code(catid, code_name=self.ui.textEdit.textCursor().selectedText())
-        new_code = None
-        for c in self.codes:
-            if c not in codes_copy:
-                new_code = c
+        new_code = next((c for c in self.codes if c['cid'] not in old_cids), None)
         if new_code is None and not in_vivo:
             # Not a new code and not an in vivo coding
             return
         if new_code is None and in_vivo:
             # Find existing code name that matches in vivo selection
-            new_code = None
-            for c in self.codes:
-                if c['name'] == self.ui.textEdit.textCursor().selectedText():
-                    new_code = c
-        self.recursive_set_current_item(self.ui.treeWidget.invisibleRootItem(), new_code['name'])
+            new_code = self.codes_by_name.get(self.ui.textEdit.textCursor().selectedText())
+        if new_code is None:
+            return
+        self.set_current_code_item(new_code['name'])
         self.mark()
 
     def change_code_to_another_code(self, position):
@@ -1453,11 +1699,9 @@ class DialogCodeText(QtWidgets.QWidget):
         # Get coded segments at this position
         if self.file_ is None:
             return
-        coded_text_list = []
-        for item in self.code_text:
-            if item['pos0'] <= position + self.file_['start'] <= item['pos1'] and \
-                    item['owner'] == self.app.settings['codername']:
-                coded_text_list.append(item)
+        coder = self.app.settings['codername']
+        coded_text_list = [item for item in self.codes_at_position(position + self.file_['start'])
+                           if item['owner'] == coder]
         if not coded_text_list:
             return
         text_item = []
@@ -1473,13 +1717,8 @@ class DialogCodeText(QtWidgets.QWidget):
         if not text_item:
             return
         # Get replacement code
-        codes_list = deepcopy(self.codes)
-        to_remove = None
-        for code_ in codes_list:
-            if code_['cid'] == text_item['cid']:
-                to_remove = code_
-        if to_remove:
-            codes_list.remove(to_remove)
+        # The selection dialog only reads the code dictionaries, so they are not copied
+        codes_list = [code_ for code_ in self.codes if code_['cid'] != text_item['cid']]
         ui = DialogSelectItems(self.app, codes_list, _("Select replacement code"), "single")
         ok = ui.exec()
         if not ok:
@@ -1497,23 +1736,17 @@ class DialogCodeText(QtWidgets.QWidget):
         self.app.delete_backup = False
         self.get_coded_text_update_eventfilter_tooltips()
 
-    def recursive_set_current_item(self, item, text_):
-        """ Set matching item to be the current selected item.
-        Recurse through any child categories.
-        Tried to use QTreeWidget.finditems - but this did not find matching item text
-        Called by: textEdit recent codes menu option
+    def set_current_code_item(self, text_):
+        """ Set the tree item of the code with this name to be the current selected item.
+        Called by: textEdit recent codes menu option, mark with new code
         Required for: mark()
         Args:
-            item : QTreeWidgetItem - usually root
-            text_ : String
+            text_ : String code name
         """
 
-        child_count = item.childCount()
-        for i in range(child_count):
-            if item.child(i).text(1)[0:3] == "cid" and (item.child(i).text(0) == text_
-                                                        or item.child(i).toolTip(0) == text_):
-                self.ui.treeWidget.setCurrentItem(item.child(i))
-            self.recursive_set_current_item(item.child(i), text_)
+        item = self.tree_items_by_code_name.get(text_)
+        if item is not None:
+            self.ui.treeWidget.setCurrentItem(item)
 
     def is_annotated(self, position):
         """ Check if position is annotated to provide annotation menu option.
@@ -1523,11 +1756,9 @@ class DialogCodeText(QtWidgets.QWidget):
             True or False
         """
 
-        for note in self.annotations:
-            if (note['pos0'] <= position + self.file_['start'] <= note['pos1']) \
-                    and note['fid'] == self.file_['id']:
-                return True
-        return False
+        pos = position + self.file_['start']
+        fid = self.file_['id']
+        return any(note['pos0'] <= pos <= note['pos1'] and note['fid'] == fid for note in self.annotations)
 
     def set_important(self, position, important=True):
         """ Set or unset importance to coded text.
@@ -1542,10 +1773,10 @@ class DialogCodeText(QtWidgets.QWidget):
             position = self.ui.textEdit.textCursor().position()
         if self.file_ is None:
             return
+        coder = self.app.settings['codername']
         coded_text_list = []
-        for item in self.code_text:
-            if item['pos0'] <= position + self.file_['start'] <= item['pos1'] and \
-                    item['owner'] == self.app.settings['codername'] and \
+        for item in self.codes_at_position(position + self.file_['start']):
+            if item['owner'] == coder and \
                     ((not important and item['important'] == 1) or (important and item['important'] != 1)):
                 coded_text_list.append(item)
         if not coded_text_list:
@@ -1567,9 +1798,8 @@ class DialogCodeText(QtWidgets.QWidget):
             importance = 1
         cur = self.app.conn.cursor()
         sql = "update code_text set important=? where ctid=?"
-        for item in text_items:
-            cur.execute(sql, [importance, item['ctid']])
-            self.app.conn.commit()
+        cur.executemany(sql, [(importance, item['ctid']) for item in text_items])
+        self.app.conn.commit()
         self.app.delete_backup = False
         self.get_coded_text_update_eventfilter_tooltips()
 
@@ -1599,12 +1829,13 @@ class DialogCodeText(QtWidgets.QWidget):
         cur = self.app.conn.cursor()
         cur.execute("update source set memo=? where id=?", (memo, file_['id']))
         self.app.conn.commit()
-        items = self.ui.listWidget.findItems(file_['name'], Qt.MatchFlag.MatchExactly)
-        if len(items) == 1:
-            tt = items[0].toolTip()
+        row = self.file_rows_by_name.get(file_['name'])
+        if row is not None:
+            item = self.ui.listWidget.item(row)
+            tt = item.toolTip()
             memo_pos = (tt.find(_("Memo:")))
             new_tt = f"{tt[:memo_pos]} {_('Memo:')} {file_['memo']}"
-            items[0].setToolTip(new_tt)
+            item.setToolTip(new_tt)
         self.app.delete_backup = False
 
     def coded_text_memo(self, position=None):
@@ -1618,11 +1849,9 @@ class DialogCodeText(QtWidgets.QWidget):
             position = self.ui.textEdit.textCursor().position()
         if self.file_ is None:
             return
-        coded_text_list = []
-        for item in self.code_text:
-            if item['pos0'] <= position + self.file_['start'] <= item['pos1'] and \
-                    item['owner'] == self.app.settings['codername']:
-                coded_text_list.append(item)
+        coder = self.app.settings['codername']
+        coded_text_list = [item for item in self.codes_at_position(position + self.file_['start'])
+                           if item['owner'] == coder]
         if not coded_text_list:
             return
         text_item = None
@@ -1645,16 +1874,10 @@ class DialogCodeText(QtWidgets.QWidget):
         if memo == text_item['memo']:
             return
         cur = self.app.conn.cursor()
-        cur.execute("update code_text set memo=? where cid=? and fid=? and seltext=? and pos0=? and pos1=? and owner=?",
-                    (memo, text_item['cid'], text_item['fid'], text_item['seltext'], text_item['pos0'],
-                     text_item['pos1'],
-                     text_item['owner']))
+        cur.execute("update code_text set memo=? where ctid=?", (memo, text_item['ctid']))
         self.app.conn.commit()
-        for i in self.code_text:
-            if text_item['cid'] == i['cid'] and text_item['seltext'] == i['seltext'] \
-                    and text_item['pos0'] == i['pos0'] and text_item['pos1'] == i['pos1'] \
-                    and text_item['owner'] == self.app.settings['codername']:
-                i['memo'] = memo
+        # text_item is the code_text dictionary for this coding
+        text_item['memo'] = memo
         self.app.delete_backup = False
         self.get_coded_text_update_eventfilter_tooltips()
 
@@ -1669,10 +1892,10 @@ class DialogCodeText(QtWidgets.QWidget):
 
         if self.file_ is None:
             return
-        code_list = []
-        for item in self.code_text:
-            if item['pos0'] > position + self.file_['start']:
-                code_list.append(item)
+        # Codings starting after the position, from the pos0 index
+        order_by_pos0, pos0s = self.code_text_pos0_index[:2]
+        first = bisect_right(pos0s, position + self.file_['start'])
+        code_list = [self.code_text[i] for i in order_by_pos0[first:]]
         if not code_list:
             return
         int_dialog = QtWidgets.QInputDialog()
@@ -1694,23 +1917,20 @@ class DialogCodeText(QtWidgets.QWidget):
             return
         int_dialog.done(1)  # Need this, as reactivated when called again with same int value.
         cur = self.app.conn.cursor()
-        length_sql = "select length(fulltext) from source where id=?"
-        cur.execute(length_sql, [self.file_['id']])
-        fulltext_length = cur.fetchone()[0]
-        text_sql = "select substr(fulltext,?,?), length(fulltext) from source where id=?"
-        # Update code_text rows in database
-        for coded in code_list:
-            # print(coded['seltext'], coded['pos0'], coded['pos1'])
-            new_pos0 = coded['pos0'] + delta_shift
-            new_pos1 = coded['pos1'] + delta_shift
-            # Get seltext and update if coded pos0 and pos1 are within bounds
-            if new_pos0 > -1 and new_pos1 < fulltext_length:
-                cur.execute(text_sql, [new_pos0, new_pos1 - new_pos0, self.file_['id']])
-                seltext = cur.fetchone()[0]
-                # print("len", fulltext_length, seltext)
-                sql = "update code_text set pos0=?, pos1=?, seltext=? where ctid=?"
-                cur.execute(sql, [new_pos0, new_pos1, seltext, coded['ctid']])
-                self.app.conn.commit()
+        fulltext_length = len(self.get_file_fulltext(self.file_))
+        # Update code_text rows in database, in one statement per 500 codings.
+        # Only codings with shifted pos0 and pos1 within the text bounds are updated.
+        # The seltext is taken from the source text at the shifted positions, substr is 1-based.
+        ctids = [coded['ctid'] for coded in code_list]
+        for i in range(0, len(ctids), 500):
+            chunk_ctids = ctids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk_ctids))
+            sql = "update code_text set pos0=pos0+?, pos1=pos1+?, " \
+                  "seltext=substr((select fulltext from source where id=?), pos0+?+1, pos1-pos0) " \
+                  f"where ctid in ({placeholders}) and pos0+?>-1 and pos1+?<?"
+            cur.execute(sql, [delta_shift, delta_shift, self.file_['id'], delta_shift] + chunk_ctids +
+                        [delta_shift, delta_shift, fulltext_length])
+        self.app.conn.commit()
         self.app.delete_backup = False
         self.get_coded_text_update_eventfilter_tooltips()
 
@@ -1722,106 +1942,115 @@ class DialogCodeText(QtWidgets.QWidget):
         cb = QtWidgets.QApplication.clipboard()
         cb.setText(selected_text)
 
+    def create_tree_menu(self):
+        """ Create the code tree context menu once, it is reused for every right click.
+        Category and code specific actions are shown or hidden in tree_menu.
+        Called by: tree_menu
+        returns: Tuple of QMenu and Dictionary of QActions """
+
+        if self.tree_menu_actions is not None:
+            return self.tree_menu_widget, self.tree_menu_actions
+        menu = QtWidgets.QMenu()
+        actions = {'add_code_to_category': menu.addAction(_("Add new code to category")),
+                   'add_category_to_category': menu.addAction(_("Add a new category to category")),
+                   'merge_category': menu.addAction(_("Merge category into category")),
+                   'add_code': menu.addAction(_("Add a new code")),
+                   'add_category': menu.addAction(_("Add a new category")),
+                   'rename': menu.addAction(_("Rename")),
+                   'edit_memo': menu.addAction(_("View or edit memo")),
+                   'delete': menu.addAction(_("Delete")),
+                   'color': menu.addAction(_("Change code color")),
+                   'show_coded_media': menu.addAction(_("Show coded files")),
+                   'move_code': menu.addAction(_("Move code to")),
+                   'show_codes_like': menu.addAction(_("Show codes like")),
+                   'show_codes_of_colour': menu.addAction(_("Show codes of colour")),
+                   'all_asc': menu.addAction(_("Sort ascending")),
+                   'all_desc': menu.addAction(_("Sort descending")),
+                   'cat_then_code_asc': menu.addAction(_("Sort category then code ascending"))}
+        self.tree_menu_widget = menu
+        self.tree_menu_actions = actions
+        return menu, actions
+
     def tree_menu(self, position):
         """ Context menu for treewidget code/category items.
         Add, rename, memo, move or delete code or category. Change code color.
         Assign selected text to current hovered code. """
 
-        menu = QtWidgets.QMenu()
+        menu, actions = self.create_tree_menu()
         menu.setStyleSheet("QMenu {font-size:" + str(self.app.settings['fontsize']) + "pt} ")
         selected = self.ui.treeWidget.currentItem()
-        action_add_code_to_category = None
-        action_add_category_to_category = None
-        action_merge_category = None
-        if selected is not None and selected.text(1)[0:3] == 'cat':
-            action_add_code_to_category = menu.addAction(_("Add new code to category"))
-            action_add_category_to_category = menu.addAction(_("Add a new category to category"))
-            action_merge_category = menu.addAction(_("Merge category into category"))
-        action_add_code = menu.addAction(_("Add a new code"))
-        action_add_category = menu.addAction(_("Add a new category"))
-        action_rename = menu.addAction(_("Rename"))
-        action_edit_memo = menu.addAction(_("View or edit memo"))
-        action_delete = menu.addAction(_("Delete"))
-        action_color = None
-        action_show_coded_media = None
-        action_move_code = None
-        if selected is not None and selected.text(1)[0:3] == 'cid':
-            action_color = menu.addAction(_("Change code color"))
-            action_show_coded_media = menu.addAction(_("Show coded files"))
-            action_move_code = menu.addAction(_("Move code to"))
-        action_show_codes_like = menu.addAction(_("Show codes like"))
-        action_show_codes_of_colour = menu.addAction(_("Show codes of colour"))
-        action_all_asc = menu.addAction(_("Sort ascending"))
-        action_all_desc = menu.addAction(_("Sort descending"))
-        action_cat_then_code_asc = menu.addAction(_("Sort category then code ascending"))
-
+        selected_type = None
+        if selected is not None:
+            selected_type = tree_item_id(selected)[0]
+        for name in ('add_code_to_category', 'add_category_to_category', 'merge_category'):
+            actions[name].setVisible(selected_type == 'catid')
+        for name in ('color', 'show_coded_media', 'move_code'):
+            actions[name].setVisible(selected_type == 'cid')
         action = menu.exec(self.ui.treeWidget.mapToGlobal(position))
         if action is not None:
-            if action == action_all_asc:
+            if action == actions['all_asc']:
                 self.tree_sort_option = "all asc"
                 self.fill_tree()
-            if action == action_all_desc:
+            if action == actions['all_desc']:
                 self.tree_sort_option = "all desc"
                 self.fill_tree()
-            if action == action_cat_then_code_asc:
+            if action == actions['cat_then_code_asc']:
                 self.tree_sort_option = "cat and code asc"
                 self.fill_tree()
-            if action == action_show_codes_like:
+            if action == actions['show_codes_like']:
                 self.show_codes_like()
                 return
-            if action == action_show_codes_of_colour:
+            if action == actions['show_codes_of_colour']:
                 self.show_codes_of_color()
                 return
-            if selected is not None and action == action_color:
+            if selected is not None and action == actions['color']:
                 self.change_code_color(selected)
-            if action == action_add_category:
+            if action == actions['add_category']:
                 self.add_category()
-            if action == action_add_code:
+            if action == actions['add_code']:
                 self.add_code()
-            if action == action_merge_category:
-                catid = int(selected.text(1).split(":")[1])
+            if action == actions['merge_category']:
+                catid = tree_item_id(selected)[1]
                 self.merge_category(catid)
-            if action == action_add_code_to_category:
-                catid = int(selected.text(1).split(":")[1])
+            if action == actions['add_code_to_category']:
+                catid = tree_item_id(selected)[1]
                 self.add_code(catid)
-            if action == action_add_category_to_category:
-                catid = int(selected.text(1).split(":")[1])
+            if action == actions['add_category_to_category']:
+                catid = tree_item_id(selected)[1]
                 self.add_category(catid)
-            if selected is not None and action == action_move_code:
+            if selected is not None and action == actions['move_code']:
                 self.move_code(selected)
-            if selected is not None and action == action_rename:
+            if selected is not None and action == actions['rename']:
                 self.rename_category_or_code(selected)
-            if selected is not None and action == action_edit_memo:
+            if selected is not None and action == actions['edit_memo']:
                 self.add_edit_cat_or_code_memo(selected)
-            if selected is not None and action == action_delete:
+            if selected is not None and action == actions['delete']:
                 self.delete_category_or_code(selected)
-            if selected is not None and action == action_show_coded_media:
-                found_code = None
-                tofind = int(selected.text(1)[4:])
-                for code in self.codes:
-                    if code['cid'] == tofind:
-                        found_code = code
-                        break
+            if selected is not None and action == actions['show_coded_media']:
+                found_code = self.codes_by_cid.get(tree_item_id(selected)[1])
                 if found_code:
                     self.coded_media_dialog(found_code)
 
-    def recursive_non_merge_item(self, item, no_merge_list):
-        """ Find matching item to be the current selected item.
-        Recurse through any child categories.
-        Tried to use QTreeWidget.finditems - but this did not find matching item text
-        Called by: textEdit recent codes menu option
+    @staticmethod
+    def child_category_ids(item):
+        """ Find the ids of all categories below this tree item, using a worklist rather than recursion.
         Required for: merge_category()
         Args:
             item : QTreeWidgetItem
-            no_merge_list : List of child Category ids (as Strings)
+        Returns:
+            List of child Category ids (as Strings)
         """
 
-        child_count = item.childCount()
-        for i in range(child_count):
-            if item.child(i).text(1)[0:3] == "cat":
-                no_merge_list.append(item.child(i).text(1)[6:])
-            self.recursive_non_merge_item(item.child(i), no_merge_list)
-        return no_merge_list
+        category_ids = []
+        items = [item]
+        while items:
+            item = items.pop()
+            for i in range(item.childCount()):
+                child = item.child(i)
+                if tree_item_id(child)[0] == 'catid':
+                    category_ids.append(str(tree_item_id(child)[1]))
+                    items.append(child)
+        return category_ids
 
     def merge_category(self, catid):
         """ Select another category to merge this category into.
@@ -1829,8 +2058,7 @@ class DialogCodeText(QtWidgets.QWidget):
             catid : Integer category identifier
         """
 
-        do_not_merge_list = []
-        do_not_merge_list = self.recursive_non_merge_item(self.ui.treeWidget.currentItem(), do_not_merge_list)
+        do_not_merge_list = self.child_category_ids(self.ui.treeWidget.currentItem())
         do_not_merge_list.append(str(catid))
         do_not_merge_ids_string = "(" + ",".join(do_not_merge_list) + ")"
         sql = "select name, catid, supercatid from code_cat where catid not in "
@@ -1847,21 +2075,11 @@ class DialogCodeText(QtWidgets.QWidget):
             return
         category = ui.get_selected()
         try:
-            for code in self.codes:
-                if code['catid'] == catid:
-                    cur.execute("update code_name set catid=? where catid=?", [category['catid'], catid])
+            cur.execute("update code_name set catid=? where catid=?", [category['catid'], catid])
             cur.execute("delete from code_cat where catid=?", [catid])
-            self.update_dialog_codes_and_categories()
-            for cat in self.categories:
-                if cat['supercatid'] == catid:
-                    cur.execute("update code_cat set supercatid=? where supercatid=?", [category['catid'], catid])
+            cur.execute("update code_cat set supercatid=? where supercatid=?", [category['catid'], catid])
             # Clear any orphan supercatids
-            sql = "select supercatid from code_cat where supercatid not in (select catid from code_cat)"
-            cur.execute(sql)
-            orphans = cur.fetchall()
-            sql = "update code_cat set supercatid=Null where supercatid=?"
-            for orphan in orphans:
-                cur.execute(sql, [orphan[0]])
+            cur.execute("update code_cat set supercatid=Null where supercatid not in (select catid from code_cat)")
             self.app.conn.commit()
         except Exception as e_:
             print(e_)
@@ -1877,7 +2095,7 @@ class DialogCodeText(QtWidgets.QWidget):
             selected : QTreeWidgetItem
          """
 
-        cid = int(selected.text(1)[4:])
+        cid = tree_item_id(selected)[1]
         cur = self.app.conn.cursor()
         cur.execute("select name, catid from code_cat order by name")
         res = cur.fetchall()
@@ -1898,19 +2116,19 @@ class DialogCodeText(QtWidgets.QWidget):
 
         if self.file_ is None:
             return
-        text_ = ""
         cur = self.app.conn.cursor()
         sql = "select code_name.name, pos0,pos1, seltext, code_text.memo "
         sql += "from code_text join code_name on code_text.cid = code_name.cid "
-        sql += "where length(code_text.memo)>0 and fid=? and code_text.owner=? order by pos0"
+        sql += "where code_text.memo is not null and code_text.memo != '' and fid=? and code_text.owner=? order by pos0"
         cur.execute(sql, [self.file_['id'], self.app.settings['codername']])
-        res = cur.fetchall()
-        if not res:
-            return
-        for r in res:
-            text_ += f'[{r[1]}-{r[2]}] ' + _("Code: ") + f'{r[0]}\n'
-            text_ += _("Text: ") + f"{r[3]}\n"
-            text_ += _("Memo: ") + f"{r[4]}\n\n"
+        code_label, text_label, memo_label = _("Code: "), _("Text: "), _("Memo: ")
+        # Read rows from the cursor and join the parts once, rather than concatenating per row
+        parts = []
+        for r in cur:
+            parts.append(f'[{r[1]}-{r[2]}] {code_label}{r[0]}\n{text_label}{r[3]}\n{memo_label}{r[4]}\n\n')
+        if not parts:
+            return
+        text_ = "".join(parts)
         ui = DialogMemo(self.app, _("Memos for file: ") + self.file_['name'], text_)
         ui.ui.pushButton_clear.hide()
         ui.ui.textEdit.setReadOnly(True)
@@ -1921,19 +2139,19 @@ class DialogCodeText(QtWidgets.QWidget):
 
         if self.file_ is None:
             return
-        text_ = ""
         cur = self.app.conn.cursor()
         sql = "select substr(source.fulltext,pos0+1 ,pos1-pos0), pos0, pos1, annotation.memo "
         sql += "from annotation join source on annotation.fid = source.id "
         sql += "where fid=? and annotation.owner=? order by pos0"
         cur.execute(sql, [self.file_['id'], self.app.settings['codername']])
-        res = cur.fetchall()
-        if not res:
-            return
-        for r in res:
-            text_ += f"[{r[1]}-{r[2]}] \n"
-            text_ += _("Text: ") + f"{r[0]}\n"
-            text_ += _("Annotation: ") + r[3] + "\n\n"
+        text_label, annotation_label = _("Text: "), _("Annotation: ")
+        # Read rows from the cursor and join the parts once, rather than concatenating per row
+        parts = []
+        for r in cur:
+            parts.append(f"[{r[1]}-{r[2]}] \n{text_label}{r[0]}\n{annotation_label}{r[3]}\n\n")
+        if not parts:
+            return
+        text_ = "".join(parts)
         ui = DialogMemo(self.app, _("Annotations for file: ") + self.file_['name'], text_)
         ui.ui.pushButton_clear.hide()
         ui.ui.textEdit.setReadOnly(True)
@@ -1945,10 +2163,10 @@ class DialogCodeText(QtWidgets.QWidget):
         self.important = not self.important
         if self.important:
             self.ui.pushButton_important.setToolTip(_("Showing important codings"))
-            self.ui.pushButton_important.setIcon(qta.icon('mdi6.star'))
+            self.ui.pushButton_important.setIcon(cached_icon('mdi6.star'))
         else:
             self.ui.pushButton_important.setToolTip(_("Show codings flagged important"))
-            self.ui.pushButton_important.setIcon(qta.icon('mdi6.star-outline'))
+            self.ui.pushButton_important.setIcon(cached_icon('mdi6.star-outline'))
         self.get_coded_text_update_eventfilter_tooltips()
 
     def show_codes_like(self):
@@ -1967,8 +2185,7 @@ class DialogCodeText(QtWidgets.QWidget):
         if not ok:
             return
         text_ = str(dialog.textValue())
-        root = self.ui.treeWidget.invisibleRootItem()
-        self.recursive_traverse(root, text_)
+        self.show_codes_matching(text_)
 
     def show_codes_of_color(self):
         """ Show all codes in colour range in code tree., ir all codes if no selection.
@@ -1982,25 +2199,34 @@ class DialogCodeText(QtWidgets.QWidget):
         selected_color = ui.get_selected()
         show_codes_of_colour_range(self.app, self.ui.treeWidget, self.codes, selected_color)
 
-    def recursive_traverse(self, item, text_):
-        """ Find all children codes of this item that match or not and hide or unhide based on 'text'.
-        Looks at tooltip also because the code text may be shortened to 50 characters for display, and the tooltip
-        is not shortened.
-        Recurse through all child categories.
+    def show_codes_matching(self, text_):
+        """ Hide code tree items that do not match 'text', or unhide all codes if 'text' is blank.
+        Looks at the code name also because the code text may be shortened to 50 characters for display.
+        Code items are found through tree_items_by_cid, rather than traversing the tree.
         Called by: show_codes_like
         Args:
-            item: a QTreeWidgetItem
             text_:  Text string for matching with code names
         """
 
-        child_count = item.childCount()
-        for i in range(child_count):
-            if "cid:" in item.child(i).text(1) and len(text_) > 0 and text_ not in item.child(i).text(0) and \
-                    text_ not in item.child(i).toolTip(0):
-                item.child(i).setHidden(True)
-            if "cid:" in item.child(i).text(1) and text_ == "":
-                item.child(i).setHidden(False)
-            self.recursive_traverse(item.child(i), text_)
+        for code_ in self.codes:
+            item = self.tree_items_by_cid.get(code_['cid'])
+            if item is None:
+                continue
+            if text_ == "":
+                item.setHidden(False)
+            elif text_ not in item.text(0) and text_ not in code_['name']:
+                item.setHidden(True)
+
+    def closeEvent(self, event):
+        """ Write resized codings that are waiting for the save timer, as the timer is removed with this dialog.
+        Update report trees that were not updated while the reports tab was hidden.
+        The reports tab event filter is removed with this dialog. """
+
+        if self.pending_resizes:
+            self.save_resized_codes()
+        if self.report_trees_pending:
+            self.fill_report_trees()
+        super().closeEvent(event)
 
     def keyPressEvent(self, event):
         """
@@ -2028,45 +2254,13 @@ class DialogCodeText(QtWidgets.QWidget):
         key = event.key()
         mods = event.modifiers()
 
-        # Ctrl + F jump to search box
-        if key == QtCore.Qt.Key.Key_F and mods == QtCore.Qt.KeyboardModifier.ControlModifier:
-            self.ui.lineEdit_search.setFocus()
-            return
-        # Ctrl Z undo last unmarked coding
-        if key == QtCore.Qt.Key.Key_Z and mods == QtCore.Qt.KeyboardModifier.ControlModifier:
-            self.undo_last_unmarked_code()
-            return
-        # Ctrl 0 to 9
+        # Ctrl F jump to search box, Ctrl Z undo last unmarked coding, Ctrl 0 to 9
+        # Ctrl F and Ctrl Z need Ctrl alone, Ctrl 0 to 9 also work with other modifiers
         if mods & QtCore.Qt.KeyboardModifier.ControlModifier:
-            if key == QtCore.Qt.Key.Key_1:
-                self.go_to_next_file()
-                return
-            if key == QtCore.Qt.Key.Key_2:
-                self.go_to_latest_coded_file()
-                return
-            if key == QtCore.Qt.Key.Key_3:
-                self.go_to_bookmark()
-                return
-            if key == QtCore.Qt.Key.Key_4:
-                self.file_memo(self.file_)
-                return
-            if key == QtCore.Qt.Key.Key_5:
-                self.get_files_from_attributes()
-                return
-            if key == QtCore.Qt.Key.Key_6:
-                self.show_selected_code_in_text_previous()
-                return
-            if key == QtCore.Qt.Key.Key_7:
-                self.show_selected_code_in_text_next()
-                return
-            if key == QtCore.Qt.Key.Key_8:
-                self.show_all_codes_in_text()
-                return
-            if key == QtCore.Qt.Key.Key_9:
-                self.show_important_coded()
-                return
-            if key == QtCore.Qt.Key.Key_0:
-                self.help()
+            action = self.ctrl_key_actions.get(key)
+            if action is not None and (mods == QtCore.Qt.KeyboardModifier.ControlModifier or
+                                       key not in (QtCore.Qt.Key.Key_F, QtCore.Qt.Key.Key_Z)):
+                action()
                 return
 
         if not self.ui.textEdit.hasFocus():
@@ -2074,78 +2268,35 @@ class DialogCodeText(QtWidgets.QWidget):
         # Ignore all other key events if edit mode is active
         if self.edit_mode:
             return
-        key = event.key()
-        # mod = QtGui.QGuiApplication.keyboardModifiers()
         cursor_pos = self.ui.textEdit.textCursor().position()
-        selected_text = self.ui.textEdit.textCursor().selectedText()
-        codes_here = []
-        for item in self.code_text:
-            if item['pos0'] <= cursor_pos + self.file_['start'] <= item['pos1'] and \
-                    item['owner'] == self.app.settings['codername']:
-                codes_here.append(item)
-        # Hash display character position
-        if key == QtCore.Qt.Key.Key_Exclam:
-            Message(self.app, _("Text position") + " " * 20, _("Character position: ") + str(cursor_pos)).exec()
-            return
-        if key == QtCore.Qt.Key.Key_Dollar:
-            self.shift_code_positions(self.ui.textEdit.textCursor().position() + self.file_['start'])
-            return
-        # Annotate selected
-        if key == QtCore.Qt.Key.Key_A and selected_text != "":
-            self.annotate()
-            return
-        # Bookmark
-        if key == QtCore.Qt.Key.Key_B and self.file_ is not None:
-            text_pos = self.ui.textEdit.textCursor().position() + self.file_['start']
-            cur = self.app.conn.cursor()
-            cur.execute("update project set bookmarkfile=?, bookmarkpos=?", [self.file_['id'], text_pos])
-            self.app.conn.commit()
-            return
-        # Hide unHide top groupbox
-        if key == QtCore.Qt.Key.Key_H:
-            self.ui.groupBox.setHidden(not (self.ui.groupBox.isHidden()))
-            return
-        # Important  for coded text
-        if key == QtCore.Qt.Key.Key_I:
-            self.set_important(cursor_pos)
-            return
-        # Show codes like
-        if key == QtCore.Qt.Key.Key_L:
-            self.show_codes_like()
-        # Memo for current code
-        if key == QtCore.Qt.Key.Key_M:
-            self.coded_text_memo(cursor_pos)
-            return
-        if key == QtCore.Qt.Key.Key_N and self.ui.textEdit.textCursor().selectedText() != '':
-            self.mark_with_new_code(False)
-            return
         # Overlapping codes cycle
-        now = datetime.datetime.now()
-        overlap_diff = now - self.overlap_timer
-        if key == QtCore.Qt.Key.Key_O and len(self.overlaps_at_pos) > 0 and overlap_diff.microseconds > 150000:
-            self.overlap_timer = datetime.datetime.now()
-            self.highlight_selected_overlap()
-            return
-        # Quick mark selected
-        if key == QtCore.Qt.Key.Key_Q and selected_text != "":
-            self.mark()
-            return
-        # Unmark at text position
-        if key == QtCore.Qt.Key.Key_U:
-            self.unmark(cursor_pos)
-            return
-        # Create or assign in vivo code to selected text
-        if key == QtCore.Qt.Key.Key_V and selected_text != "":
-            self.mark_with_new_code(in_vivo=True)
-            return
-        # Recent codes context menu
-        if key == QtCore.Qt.Key.Key_R and self.file_ is not None and self.ui.textEdit.textCursor().selectedText() != "":
-            self.text_edit_recent_codes_menu(self.ui.textEdit.cursorRect().topLeft())
+        if key == QtCore.Qt.Key.Key_O:
+            if self.overlap_debounce_timer.isActive():
+                self.overlap_debounce_timer.stop()
+                self.overlapping_codes_in_text()
+            now = time.monotonic()
+            if len(self.overlaps_at_pos) > 0 and now - self.overlap_timer > 0.15:
+                self.overlap_timer = now
+                self.highlight_selected_overlap()
+            return
+        if key not in self.text_key_actions:
+            return
+        action, selection = self.text_key_actions[key]
+        # selection: None any, True requires selected text, False requires no selected text
+        if selection is None or selection == (self.ui.textEdit.textCursor().selectedText() != ""):
+            action(cursor_pos)
+
+    def set_bookmark(self, position):
+        """ Bookmark this position in the current file. B key press.
+        Args:
+            position: Integer - text cursor position
+        """
+
+        if self.file_ is None:
             return
-        # Search, with or without selected
-        if key == QtCore.Qt.Key.Key_S and self.file_ is not None:
-            if selected_text == "":
-                self.ui.lineEdit_search.setFocus()
+        cur = self.app.conn.cursor()
+        cur.execute("update project set bookmarkfile=?, bookmarkpos=?", [self.file_['id'], position + self.file_['start']])
+        self.app.conn.commit()
 
     def highlight_selected_overlap(self):
         """ Highlight the current overlapping text code, by placing formatting on top. """
@@ -2154,38 +2305,51 @@ class DialogCodeText(QtWidgets.QWidget):
         if self.overlaps_at_pos_idx >= len(self.overlaps_at_pos):
             self.overlaps_at_pos_idx = 0
         item = self.overlaps_at_pos[self.overlaps_at_pos_idx]
-        # Remove formatting
+        color = self.codes_by_cid.get(item['cid'], {}).get('color', "")
+        self.set_extra_selection(int(item['pos0'] - self.file_['start']), int(item['pos1'] - self.file_['start']),
+                                 color, item['important'])
+
+    def set_extra_selection(self, pos0, pos1, color, bold=False, underline=False):
+        """ Show one coded text section on top of the text highlights, as a textEdit extra selection.
+        The document character formats are left unchanged, and unlight removes the extra selection.
+        Called by: highlight_selected_overlap, show_selected_code_in_text_next, show_selected_code_in_text_previous,
+        update_resized_code
+        Args:
+            pos0 : Integer start position in the textEdit
+            pos1 : Integer end position in the textEdit
+            color : String code colour
+            bold : Boolean, show in bold text
+            underline : Boolean, underline the text
+        """
+
         cursor = self.ui.textEdit.textCursor()
-        cursor.setPosition(int(item['pos0'] - self.file_['start']), QtGui.QTextCursor.MoveMode.MoveAnchor)
-        cursor.setPosition(int(item['pos1'] - self.file_['start']), QtGui.QTextCursor.MoveMode.KeepAnchor)
-        cursor.setCharFormat(QtGui.QTextCharFormat())
-        # Reapply formatting
-        color = ""
-        for code in self.codes:
-            if code['cid'] == item['cid']:
-                color = code['color']
+        cursor.setPosition(pos0, QtGui.QTextCursor.MoveMode.MoveAnchor)
+        cursor.setPosition(pos1, QtGui.QTextCursor.MoveMode.KeepAnchor)
+        background, foreground = code_color_brushes(color)
         fmt = QtGui.QTextCharFormat()
-        brush = QBrush(QColor(color))
-        fmt.setBackground(brush)
-        if item['important']:
+        fmt.setBackground(background)
+        fmt.setForeground(foreground)
+        if bold:
             fmt.setFontWeight(QtGui.QFont.Weight.Bold)
-        fmt.setForeground(QBrush(QColor(TextColor(color).recommendation)))
-        cursor.setCharFormat(fmt)
-        self.apply_underline_to_overlaps()
+        if underline:
+            fmt.setFontUnderline(True)
+        selection = QtWidgets.QTextEdit.ExtraSelection()
+        selection.cursor = cursor
+        selection.format = fmt
+        self.ui.textEdit.setExtraSelections([selection])
 
     def overlapping_codes_in_text(self):
         """ When coded text is clicked on.
         Only enabled if two or more codes are here.
         Adjust for when portion of full text file loaded.
-        Called by: textEdit cursor position changed. """
+        Called by: overlap_debounce_timer, after textEdit cursor position changed. """
 
         self.overlaps_at_pos = []
         self.overlaps_at_pos_idx = 0
+        if self.file_ is None:
+            return
         pos = self.ui.textEdit.textCursor().position()
-        for item in self.code_text:
-            if item['pos0'] <= pos + self.file_['start'] <= item['pos1']:
-                # logger.debug("Code name for selected pos0:" + str(item['pos0'])+" pos1:"+str(item['pos1'])
-                self.overlaps_at_pos.append(item)
+        self.overlaps_at_pos = self.codes_at_position(pos + self.file_['start'])
         if len(self.overlaps_at_pos) < 2:
             self.overlaps_at_pos = []
             self.overlaps_at_pos_idx = 0
@@ -2211,7 +2375,7 @@ class DialogCodeText(QtWidgets.QWidget):
         Called by export_option_selected
         """
 
-        if len(self.ui.textEdit.document().toPlainText()) == 0:
+        if self.ui.textEdit.document().isEmpty():
             return
         filename = f"{self.file_['name']}.odt"
         exp_dir = ExportDirectoryPathDialog(self.app, filename)
@@ -2231,67 +2395,55 @@ class DialogCodeText(QtWidgets.QWidget):
         Called by export_option_selected.
         """
 
-        if len(self.ui.textEdit.document().toPlainText()) == 0:
+        if self.ui.textEdit.document().isEmpty():
             return
         plain_text = self.ui.textEdit.document().toPlainText()
-        # Prepare code text with name and ordering
-        code_text2 = deepcopy(self.code_text)
-        code_ids_used = []
-        for ct in code_text2:
-            for c in self.codes:
-                if ct['cid'] == c['cid']:
-                    ct['codename'] = html.escape(c['name'])
-                    code_ids_used.append(c['cid'])
-                    break
-        code_ids_used = list(set(code_ids_used))
+        # Span tags keyed by text position, in code_text order, so the text is only scanned once
+        tags = defaultdict(list)
+        code_ids_used = set()
+        for ct in self.code_text:
+            code_ = self.codes_by_cid.get(ct['cid'])
+            if code_ is None:
+                continue
+            code_ids_used.add(ct['cid'])
+            title = html.escape(code_['name'])
+            if ct['important'] == 1:
+                title += "\nIMPORTANT"
+            if ct['memo'] is not None and ct['memo'] != "":
+                title += f"\nMEMO: {ct['memo']}"
+            tags[ct['pos0']].append(f'<span title="{title}" style="color:#000000; background-color:{code_["color"]};">')
+            tags[ct['pos1']].append("</span>")
 
-        # Prepare html text
-        html_text = '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\
-        <html><head><meta charset="utf-8" /></head>\
-        <body style=" font-family:"Noto Sans"; font-size:10pt; font-weight:400; font-style:normal;">'
-        for i, c in enumerate(plain_text):
-            if c == "\n":
-                c = "<br />\n"
-            else:
-                if c in entities.keys():
-                    c = entities[c]  # html.escape(c)
-            for ct in code_text2:
-                if ct['pos0'] == i:
-                    title = ct['codename']
-                    if ct['important'] == 1:
-                        title += "\nIMPORTANT"
-                    if ct['memo'] is not None and ct['memo'] != "":
-                        title += f"\nMEMO: {ct['memo']}"
-                    html_text += f'<span title="{title}" style="color:#000000; background-color:{ct["color"]};">'
-                if ct['pos1'] == i:
-                    html_text += "</span>"
-            html_text += c  # Some encoding issues, e.g. the Euro symbol
-        # Add Codes list
-        codes_directory = []
-        for cd in self.codes:
-            if cd['cid'] in code_ids_used:
-                category = None
-                for cat in self.categories:
-                    if cd['catid'] == cat['catid']:
-                        category = cat['name']
-                codes_directory.append([cd['name'], cd['color'], cd['memo'], category])
-        html_text += "<br /><br /><h2>Codes list</h2>\n"
-        for cd in codes_directory:
-            html_text += f'<p><span style="background-color:{cd[1]}">&nbsp;&nbsp;&nbsp;</span> &nbsp;<b>{cd[0]}</b>'
-            if cd[3] is not None:
-                html_text += f"&nbsp;CATEGORY: {cd[3]}"
-            if cd[2] != "":
-                html_text += f"&nbsp;&nbsp;CODE MEMO: {cd[2]}"
-            html_text += '</p>'
-
-        html_text += "\n</body></html>"
         html_filename = self.file_['name'] + ".html"
         exp_dir = ExportDirectoryPathDialog(self.app, html_filename)
         filepath = exp_dir.filepath
         if filepath is None:
             return
+        # Write the html text as it is produced, rather than building the whole document first
         with open(filepath, 'w') as html_file:
-            html_file.write(html_text)
+            html_file.write('<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\
+        <html><head><meta charset="utf-8" /></head>\
+        <body style=" font-family:"Noto Sans"; font-size:10pt; font-weight:400; font-style:normal;">')
+            # Escape the text between tag positions in slices. Some encoding issues, e.g. the Euro symbol
+            prev_pos = 0
+            for pos in sorted(pos for pos in tags if 0 <= pos < len(plain_text)):
+                html_file.write(plain_text[prev_pos:pos].translate(html_entities_table))
+                html_file.writelines(tags[pos])
+                prev_pos = pos
+            html_file.write(plain_text[prev_pos:].translate(html_entities_table))
+            # Add Codes list
+            html_file.write("<br /><br /><h2>Codes list</h2>\n")
+            for cd in self.codes:
+                if cd['cid'] not in code_ids_used:
+                    continue
+                html_file.write(f'<p><span style="background-color:{cd["color"]}">&nbsp;&nbsp;&nbsp;</span> &nbsp;<b>{cd["name"]}</b>')
+                category = self.categories_by_catid.get(cd['catid'], {}).get('name')
+                if category is not None:
+                    html_file.write(f"&nbsp;CATEGORY: {category}")
+                if cd['memo'] != "":
+                    html_file.write(f"&nbsp;&nbsp;CODE MEMO: {cd['memo']}")
+                html_file.write('</p>')
+            html_file.write("\n</body></html>")
         msg = _("Coded text file exported to: ") + filepath
         self.parent_textEdit.append(msg)
         Message(self.app, _('Coded html file exported'), msg, "information").exec()
@@ -2301,54 +2453,45 @@ class DialogCodeText(QtWidgets.QWidget):
          code tags are surrounded by double braces:
          {{codename{{some coded text}}codename}}. """
 
-        if len(self.ui.textEdit.document().toPlainText()) == 0:
+        if self.ui.textEdit.document().isEmpty():
             return
         plain_text = self.ui.textEdit.document().toPlainText()
-        # Prepare code text with name and ordering
-        code_text2 = deepcopy(self.code_text)
-        code_ids_used = []
-        for ct in code_text2:
-            for c in self.codes:
-                if ct['cid'] == c['cid']:
-                    ct['codename'] = c['name']
-                    code_ids_used.append(c['cid'])
-                    break
-        code_ids_used = list(set(code_ids_used))
-
-        # Prepare text
-        tagged_text = ""
-        for i, c in enumerate(plain_text):
-            for ct in code_text2:
-                if ct['pos0'] == i:
-                    tagged_text += "{{" + ct['codename'] + "{{"
-                if ct['pos1'] == i:
-                    tagged_text += "}}" + ct['codename'] + "}}"
-            tagged_text += c
-        # Add Codes list
-        codes_list = []
-        for cd in self.codes:
-            if cd['cid'] in code_ids_used:
-                category = None
-                for cat in self.categories:
-                    if cd['catid'] == cat['catid']:
-                        category = cat['name']
-                codes_list.append([cd['name'], cd['memo'], category])
-        tagged_text += "\n\n\nCODES LIST\n"
-        for cd in codes_list:
-            tagged_text += cd[0]
-            if cd[2] is not None:
-                tagged_text += f" -- CATEGORY: {cd[2]}"
-            if cd[1] != "":
-                tagged_text += f" -- CODE MEMO: {cd[1]}"
-            tagged_text += '\n'
+        # Code tags keyed by text position, in code_text order, so the text is only scanned once
+        tags = defaultdict(list)
+        code_ids_used = set()
+        for ct in self.code_text:
+            code_ = self.codes_by_cid.get(ct['cid'])
+            if code_ is None:
+                continue
+            code_ids_used.add(ct['cid'])
+            tags[ct['pos0']].append("{{" + code_['name'] + "{{")
+            tags[ct['pos1']].append("}}" + code_['name'] + "}}")
 
         filename = self.file_['name'] + "_tagged.txt"
         exp_dir = ExportDirectoryPathDialog(self.app, filename)
         filepath = exp_dir.filepath
         if filepath is None:
             return
+        # Write the tagged text as it is produced, rather than building the whole document first
         with open(filepath, 'w') as text_file:
-            text_file.write(tagged_text)
+            prev_pos = 0
+            for pos in sorted(pos for pos in tags if 0 <= pos < len(plain_text)):
+                text_file.write(plain_text[prev_pos:pos])
+                text_file.writelines(tags[pos])
+                prev_pos = pos
+            text_file.write(plain_text[prev_pos:])
+            # Add Codes list
+            text_file.write("\n\n\nCODES LIST\n")
+            for cd in self.codes:
+                if cd['cid'] not in code_ids_used:
+                    continue
+                text_file.write(cd['name'])
+                category = self.categories_by_catid.get(cd['catid'], {}).get('name')
+                if category is not None:
+                    text_file.write(f" -- CATEGORY: {category}")
+                if cd['memo'] != "":
+                    text_file.write(f" -- CODE MEMO: {cd['memo']}")
+                text_file.write('\n')
         msg = _("Coded text file exported to: ") + filepath
         self.parent_textEdit.append(msg)
         Message(self.app, _('Coded text file exported'), msg, "information").exec()
@@ -2365,8 +2508,14 @@ class DialogCodeText(QtWidgets.QWidget):
         Shrink start and end code positions using alt arrow left and alt arrow right
         Extend start and end code positions using shift arrow left, shift arrow right
         Ctrl E Enter and exit Edit Mode
+
+        Also update report trees when the reports tab is shown, if codes changed while it was hidden.
         """
 
+        if object_ is self.tab_reports:
+            if event.type() == QtCore.QEvent.Type.Show and self.report_trees_pending:
+                self.fill_report_trees()
+            return False
         if object_ is self.ui.treeWidget.viewport():
             # If a show selected code was active, then clicking on a code in code tree, shows all codes and all tooltips
             if event.type() == QtCore.QEvent.Type.MouseButtonPress:
@@ -2385,9 +2534,7 @@ class DialogCodeText(QtWidgets.QWidget):
             mod = event.modifiers()
             first_key_press = event.type() == QtCore.QEvent.Type.KeyPress and not event.isAutoRepeat()
             # using timer for a lot of things
-            now = datetime.datetime.now()
-            diff = now - self.code_resize_timer
-            if diff.microseconds < 100000:
+            if time.monotonic() - self.code_resize_timer < 0.1:
                 if mod in (QtCore.Qt.KeyboardModifier.AltModifier, QtCore.Qt.KeyboardModifier.ShiftModifier) \
                       and key in (QtCore.Qt.Key.Key_Left, QtCore.Qt.Key.Key_Right):
                     return True # consume rapid shift + left clicks, etc. without changing selection
@@ -2400,18 +2547,17 @@ class DialogCodeText(QtWidgets.QWidget):
             # Ignore all other key events if edit mode is active
             if self.edit_mode:
                 return False
-            cursor_pos = self.ui.textEdit.textCursor().position()
-            codes_here = []
-            for item in self.code_text:
-                if item['pos0'] <= cursor_pos + self.file_['start'] <= item['pos1'] and \
-                        item['owner'] == self.app.settings['codername']:
-                    codes_here.append(item)
+            # Only shift or alt arrow left and right change code positions, skip finding codes for other keys
+            if mod not in (QtCore.Qt.KeyboardModifier.AltModifier, QtCore.Qt.KeyboardModifier.ShiftModifier) \
+                    or key not in (QtCore.Qt.Key.Key_Left, QtCore.Qt.Key.Key_Right):
+                return False
+            pos_abs = self.ui.textEdit.textCursor().position() + self.file_['start']
+            coder = self.app.settings['codername']
+            codes_here = [item for item in self.codes_at_position(pos_abs) if item['owner'] == coder]
             code_ = None
             if len(codes_here) == 0:
                 return False
-            if len(codes_here) > 1 and mod in (
-                    QtCore.Qt.KeyboardModifier.AltModifier, QtCore.Qt.KeyboardModifier.ShiftModifier) \
-                    and key in (QtCore.Qt.Key.Key_Left, QtCore.Qt.Key.Key_Right):
+            if len(codes_here) > 1:
                 ui = DialogSelectItems(self.app, codes_here, _("Select a code"), "single")
                 ok = ui.exec()
                 if not ok:
@@ -2422,7 +2568,7 @@ class DialogCodeText(QtWidgets.QWidget):
             if len(codes_here) == 1:
                 code_ = codes_here[0]
             # Key event can be too sensitive, adjusted  for 150 millisecond gap
-            self.code_resize_timer = datetime.datetime.now()
+            self.code_resize_timer = time.monotonic()
             if key == QtCore.Qt.Key.Key_Left and mod == QtCore.Qt.KeyboardModifier.AltModifier:
                 self.shrink_to_left(code_)
                 return True
@@ -2437,6 +2583,13 @@ class DialogCodeText(QtWidgets.QWidget):
                 return True
         return False
 
+    def text_edit_length(self):
+        """ Length of the textEdit plain text, without copying the text as toPlainText does.
+        The document character count includes the final paragraph separator.
+        returns: Integer """
+
+        return self.ui.textEdit.document().characterCount() - 1
+
     def extend_left(self, code_):
         """ Shift left arrow.
         Args:
@@ -2448,15 +2601,7 @@ class DialogCodeText(QtWidgets.QWidget):
         if code_['pos0'] < 1:
             return
         code_['pos0'] -= 1
-        cur = self.app.conn.cursor()
-        text_sql = "select substr(fulltext,?,?) from source where id=?"
-        cur.execute(text_sql, [code_['pos0'] + 1, code_['pos1'] - code_['pos0'], code_['fid']])
-        seltext = cur.fetchone()[0]
-        sql = "update code_text set pos0=?, seltext=? where ctid=?"
-        cur.execute(sql, (code_['pos0'], seltext, code_['ctid']))
-        self.app.conn.commit()
-        self.app.delete_backup = False
-        self.get_coded_text_update_eventfilter_tooltips()
+        self.update_resized_code(code_)
 
     def extend_right(self, code_):
         """ Shift right arrow.
@@ -2466,19 +2611,10 @@ class DialogCodeText(QtWidgets.QWidget):
 
         if not code_:
             return
-        if code_['pos1'] + 1 >= len(self.ui.textEdit.toPlainText()):
+        if code_['pos1'] + 1 >= self.text_edit_length():
             return
         code_['pos1'] += 1
-        cur = self.app.conn.cursor()
-        text_sql = "select substr(fulltext,?,?) from source where id=?"
-        cur.execute(text_sql, [code_['pos0'] + 1, code_['pos1'] - code_['pos0'], code_['fid']])
-        seltext = cur.fetchone()[0]
-        sql = "update code_text set pos1=?, seltext=? where ctid=?"
-        cur.execute(sql,
-                    (code_['pos1'], seltext, code_['ctid']))
-        self.app.conn.commit()
-        self.app.delete_backup = False
-        self.get_coded_text_update_eventfilter_tooltips()
+        self.update_resized_code(code_)
 
     def shrink_to_left(self, code_):
         """ Alt left arrow, shrinks code from the right end of the code.
@@ -2491,15 +2627,7 @@ class DialogCodeText(QtWidgets.QWidget):
         if code_['pos1'] <= code_['pos0'] + 1:
             return
         code_['pos1'] -= 1
-        cur = self.app.conn.cursor()
-        text_sql = "select substr(fulltext,?,?) from source where id=?"
-        cur.execute(text_sql, [code_['pos0'] + 1, code_['pos1'] - code_['pos0'], code_['fid']])
-        seltext = cur.fetchone()[0]
-        sql = "update code_text set pos1=?, seltext=? where ctid=?"
-        cur.execute(sql, (code_['pos1'], seltext, code_['ctid']))
-        self.app.conn.commit()
-        self.app.delete_backup = False
-        self.get_coded_text_update_eventfilter_tooltips()
+        self.update_resized_code(code_)
 
     def shrink_to_right(self, code_):
         """ Alt right arrow shrinks code from the left end of the code.
@@ -2512,15 +2640,49 @@ class DialogCodeText(QtWidgets.QWidget):
         if code_['pos0'] >= code_['pos1'] - 1:
             return
         code_['pos0'] += 1
+        self.update_resized_code(code_)
+
+    def update_resized_code(self, code_):
+        """ Keep the new extent of a coding after an extend or shrink key press, and show it.
+        The database update, the reload and highlighting of all codings wait until the key presses stop,
+        so holding down a resize key does not write and redraw on every step.
+        Called by: extend_left, extend_right, shrink_to_left, shrink_to_right
+        Args:
+            code_: code Dictionary, with the new pos0 and pos1
+        """
+
+        seltext = self.get_file_fulltext(self.file_)[code_['pos0']:code_['pos1']]
+        self.pending_resizes[code_['ctid']] = (code_['pos0'], code_['pos1'], seltext)
+        # The pos0 indexes must match the resized coding until the codings are reloaded
+        self.index_code_text()
+        self.eventFilterTT.index_code_text()
+        color = self.codes_by_cid.get(code_['cid'], {}).get('color', "")
+        self.set_extra_selection(code_['pos0'] - self.file_['start'], code_['pos1'] - self.file_['start'], color,
+                                 underline=True)
+        self.code_resize_save_timer.start()
+
+    def save_resized_codes(self):
+        """ Write the extended or shrunk codings, then reload and highlight all codings.
+        Called by: code_resize_save_timer, when the resize key presses stop, closeEvent
+        """
+
+        self.write_resized_codes()
+        self.get_coded_text_update_eventfilter_tooltips()
+
+    def write_resized_codes(self):
+        """ Update the resized codings in the database, with one executemany and commit.
+        Called by: save_resized_codes, get_coded_text_update_eventfilter_tooltips, before codings are reloaded
+        """
+
+        self.code_resize_save_timer.stop()
+        if not self.pending_resizes:
+            return
+        values = [(pos0, pos1, seltext, ctid) for ctid, (pos0, pos1, seltext) in self.pending_resizes.items()]
+        self.pending_resizes = {}
         cur = self.app.conn.cursor()
-        text_sql = "select substr(fulltext,?,?) from source where id=?"
-        cur.execute(text_sql, [code_['pos0'] + 1, code_['pos1'] - code_['pos0'], code_['fid']])
-        seltext = cur.fetchone()[0]
-        sql = "update code_text set pos0=?, seltext=? where ctid=?"
-        cur.execute(sql, (code_['pos0'], seltext, code_['ctid']))
+        cur.executemany("update code_text set pos0=?, pos1=?, seltext=? where ctid=?", values)
         self.app.conn.commit()
         self.app.delete_backup = False
-        self.get_coded_text_update_eventfilter_tooltips()
 
     def show_selected_code_in_text_next(self):
         """ Highlight only the selected code in the text. Move to next instance in text
@@ -2532,30 +2694,25 @@ class DialogCodeText(QtWidgets.QWidget):
         if self.file_ is None:
             return
         item = self.ui.treeWidget.currentItem()
-        if item is None or item.text(1)[0:3] == 'cat':
+        if item is None or tree_item_id(item)[0] == 'catid':
             return
-        cid = int(item.text(1)[4:])
-        # Index list has to be dynamic, as a new code_text item could be created before this method is called again
-        # Develop indices and tooltip coded text list
-        indexes = []
-        tt_code_text = []
-        for ct in self.code_text:
-            if ct['cid'] == cid:
-                indexes.append(ct)
-                tt_code_text.append(ct)
-        indexes = sorted(indexes, key=itemgetter('pos0'))
+        cid = tree_item_id(item)[1]
+        # Coded texts of this code in pos0 order, also the tooltip coded text list.
+        # The cid index is rebuilt whenever code_text is reloaded, e.g. after a new coding
+        indexes = self.code_text_by_cid.get(cid, [])
+        tt_code_text = indexes
         cursor = self.ui.textEdit.textCursor()
         cur_pos = cursor.position()
         end_pos = 0
         found_larger = False
         msg = "/" + str(len(indexes))
-        for i, index in enumerate(indexes):
-            if index['pos0'] - self.file_['start'] > cur_pos:
-                cur_pos = index['pos0'] - self.file_['start']
-                end_pos = index['pos1'] - self.file_['start']
-                found_larger = True
-                msg = str(i + 1) + msg
-                break
+        # First coded text starting after the cursor
+        i = bisect_right(self.code_text_pos0s_by_cid.get(cid, []), cur_pos + self.file_['start'])
+        if i < len(indexes):
+            cur_pos = indexes[i]['pos0'] - self.file_['start']
+            end_pos = indexes[i]['pos1'] - self.file_['start']
+            found_larger = True
+            msg = str(i + 1) + msg
         if not found_larger and indexes == []:
             return
         # Loop around to the highest index
@@ -2570,33 +2727,24 @@ class DialogCodeText(QtWidgets.QWidget):
         self.unlight()
         msg = " " + _("Code:") + " " + msg
         # Highlight the code in the text
-        color = ""
-        for c in self.codes:
-            if c['cid'] == cid:
-                color = c['color']
+        color = self.codes_by_cid.get(cid, {}).get('color', "")
         cursor.setPosition(cur_pos)
         self.ui.textEdit.setTextCursor(cursor)
-        cursor.setPosition(cur_pos, QtGui.QTextCursor.MoveMode.MoveAnchor)
-        cursor.setPosition(end_pos, QtGui.QTextCursor.MoveMode.KeepAnchor)
-        brush = QBrush(QColor(color))
-        fmt = QtGui.QTextCharFormat()
-        fmt.setBackground(brush)
-        foreground_color = TextColor(color).recommendation
-        fmt.setForeground(QBrush(QColor(foreground_color)))
-        cursor.mergeCharFormat(fmt)
+        self.set_extra_selection(cur_pos, end_pos, color)
+        background, foreground = code_color_brushes(color)
         # Update tooltips to show only this code
         self.eventFilterTT.set_codes_and_annotations(self.app, tt_code_text, self.codes, self.annotations,
                                                      self.file_)
         # Need to reload icons as they disappear on Windows
-        self.ui.pushButton_show_all_codings.setIcon(qta.icon('mdi6.grid'))
-        self.ui.pushButton_show_codings_prev.setStyleSheet(f"background-color: {color}; color:{foreground_color}")
-        self.ui.pushButton_show_codings_prev.setIcon(qta.icon('mdi6.arrow-left'))
+        self.ui.pushButton_show_all_codings.setIcon(cached_icon('mdi6.grid'))
+        self.ui.pushButton_show_codings_prev.setStyleSheet(f"background-color: {color}; color:{foreground.color().name()}")
+        self.ui.pushButton_show_codings_prev.setIcon(cached_icon('mdi6.arrow-left'))
         tt = _("Show previous coding of selected code") + msg
         self.ui.pushButton_show_codings_prev.setToolTip(tt)
-        self.ui.pushButton_show_codings_next.setStyleSheet(f"background-color: {color}; color:{foreground_color}")
+        self.ui.pushButton_show_codings_next.setStyleSheet(f"background-color: {color}; color:{foreground.color().name()}")
         tt = _("Show next coding of selected code") + msg
         self.ui.pushButton_show_codings_next.setToolTip(tt)
-        self.ui.pushButton_show_codings_next.setIcon(qta.icon('mdi6.arrow-right'))
+        self.ui.pushButton_show_codings_next.setIcon(cached_icon('mdi6.arrow-right'))
 
     def show_selected_code_in_text_previous(self):
         """ Highlight only the selected code in the text. Move to previous instance in text from
@@ -2607,65 +2755,51 @@ class DialogCodeText(QtWidgets.QWidget):
         if self.file_ is None:
             return
         item = self.ui.treeWidget.currentItem()
-        if item is None or item.text(1)[0:3] == 'cat':
+        if item is None or tree_item_id(item)[0] == 'catid':
             return
-        cid = int(item.text(1)[4:])
-        # Index list has to be dynamic, as a new code_text item could be created before this method is called again
-        # Develop indexes and tooltip coded text list
-        indexes = []
-        tt_code_text = []
-        for ct in self.code_text:
-            if ct['cid'] == cid:
-                indexes.append(ct)
-                tt_code_text.append(ct)
-        indexes = sorted(indexes, key=itemgetter('pos0'), reverse=True)
+        cid = tree_item_id(item)[1]
+        # Coded texts of this code in pos0 order, also the tooltip coded text list.
+        # The cid index is rebuilt whenever code_text is reloaded, e.g. after a new coding
+        indexes = self.code_text_by_cid.get(cid, [])
+        tt_code_text = indexes
         cursor = self.ui.textEdit.textCursor()
         cur_pos = cursor.position()
         end_pos = 0
         found_smaller = False
         msg = f"/{len(indexes)}"
-        for i, index in enumerate(indexes):
-            if index['pos0'] - self.file_['start'] < cur_pos - 1:
-                cur_pos = index['pos0'] - self.file_['start']
-                end_pos = index['pos1'] - self.file_['start']
-                found_smaller = True
-                msg = str(len(indexes) - i) + msg
-                break
+        # Last coded text starting before the cursor
+        i = bisect_left(self.code_text_pos0s_by_cid.get(cid, []), cur_pos - 1 + self.file_['start']) - 1
+        if i >= 0:
+            cur_pos = indexes[i]['pos0'] - self.file_['start']
+            end_pos = indexes[i]['pos1'] - self.file_['start']
+            found_smaller = True
+            msg = str(i + 1) + msg
         if not found_smaller and indexes == []:
             return
         # Loop around to the highest index
         if not found_smaller and indexes != []:
-            cur_pos = indexes[0]['pos0'] - self.file_['start']
-            end_pos = indexes[0]['pos1'] - self.file_['start']
+            cur_pos = indexes[-1]['pos0'] - self.file_['start']
+            end_pos = indexes[-1]['pos1'] - self.file_['start']
             msg = str(len(indexes)) + msg
         msg += " " + _("Code:") + " " + msg
         self.unlight()
         # Highlight the code in the text
-        color = ""
-        for c in self.codes:
-            if c['cid'] == cid:
-                color = c['color']
+        color = self.codes_by_cid.get(cid, {}).get('color', "")
         cursor.setPosition(cur_pos)
         self.ui.textEdit.setTextCursor(cursor)
-        cursor.setPosition(cur_pos, QtGui.QTextCursor.MoveMode.MoveAnchor)
-        cursor.setPosition(end_pos, QtGui.QTextCursor.MoveMode.KeepAnchor)
-        brush = QBrush(QColor(color))
-        fmt = QtGui.QTextCharFormat()
-        fmt.setBackground(brush)
-        foreground_colour = TextColor(color).recommendation
-        fmt.setForeground(QBrush(QColor(foreground_colour)))
-        cursor.mergeCharFormat(fmt)
+        self.set_extra_selection(cur_pos, end_pos, color)
+        background, foreground = code_color_brushes(color)
         # Update tooltips to show only this code
         self.eventFilterTT.set_codes_and_annotations(self.app, tt_code_text, self.codes, self.annotations,
                                                      self.file_)
         # Need to reload icons as they disapear on Windows
-        self.ui.pushButton_show_all_codings.setIcon(qta.icon('mdi6.grid'))
-        self.ui.pushButton_show_codings_prev.setStyleSheet(f"background-color: {color};color:{foreground_colour}")
-        self.ui.pushButton_show_codings_prev.setIcon(qta.icon('mdi6.arrow-left'))
+        self.ui.pushButton_show_all_codings.setIcon(cached_icon('mdi6.grid'))
+        self.ui.pushButton_show_codings_prev.setStyleSheet(f"background-color: {color};color:{foreground.color().name()}")
+        self.ui.pushButton_show_codings_prev.setIcon(cached_icon('mdi6.arrow-left'))
         tt = _("Show previous coding of selected code") + msg
         self.ui.pushButton_show_codings_prev.setToolTip(tt)
-        self.ui.pushButton_show_codings_next.setStyleSheet(f"background-color: {color};color:{foreground_colour}")
-        self.ui.pushButton_show_codings_next.setIcon(qta.icon('mdi6.arrow-right'))
+        self.ui.pushButton_show_codings_next.setStyleSheet(f"background-color: {color};color:{foreground.color().name()}")
+        self.ui.pushButton_show_codings_next.setIcon(cached_icon('mdi6.arrow-right'))
         tt = _("Show next coding of selected code") + msg
         self.ui.pushButton_show_codings_next.setToolTip(tt)
 
@@ -2673,13 +2807,13 @@ class DialogCodeText(QtWidgets.QWidget):
         """ Opposes show selected code methods.
         Highlights all the codes in the text. """
 
-        self.ui.pushButton_show_all_codings.setIcon(qta.icon('mdi6.grid-off'))
+        self.ui.pushButton_show_all_codings.setIcon(cached_icon('mdi6.grid-off'))
         self.ui.pushButton_show_codings_prev.setStyleSheet("")
         self.ui.pushButton_show_codings_next.setStyleSheet("")
-        self.ui.pushButton_show_codings_prev.setIcon(qta.icon('mdi6.arrow-left'))
+        self.ui.pushButton_show_codings_prev.setIcon(cached_icon('mdi6.arrow-left'))
         tt = _("Show previous coding of selected code")
         self.ui.pushButton_show_codings_prev.setToolTip(tt)
-        self.ui.pushButton_show_codings_next.setIcon(qta.icon('mdi6.arrow-right'))
+        self.ui.pushButton_show_codings_next.setIcon(cached_icon('mdi6.arrow-right'))
         tt = _("Show next coding of selected code")
         self.ui.pushButton_show_codings_next.setToolTip(tt)
         self.get_coded_text_update_eventfilter_tooltips()
@@ -2706,54 +2840,51 @@ class DialogCodeText(QtWidgets.QWidget):
             parent : QTreeWidgetItem
         """
 
+        item_type, item_id = tree_item_id(item)
         # Find the category in the list
-        if item.text(1)[0:3] == 'cat':
-            found = -1
-            for i in range(0, len(self.categories)):
-                if self.categories[i]['catid'] == int(item.text(1)[6:]):
-                    found = i
-            if found == -1:
+        if item_type == 'catid':
+            category = self.categories_by_catid.get(item_id)
+            if category is None:
                 return
             if parent is None:
-                self.categories[found]['supercatid'] = None
+                category['supercatid'] = None
             else:
-                if parent.text(1).split(':')[0] == 'cid':
+                parent_type, parent_id = tree_item_id(parent)
+                if parent_type == 'cid':
                     # Parent is code (leaf) cannot add child
                     return
-                supercatid = int(parent.text(1).split(':')[1])
-                if supercatid == self.categories[found]['catid']:
+                supercatid = parent_id
+                if supercatid == category['catid']:
                     # Something went wrong
                     return
-                self.categories[found]['supercatid'] = supercatid
+                category['supercatid'] = supercatid
             cur = self.app.conn.cursor()
             cur.execute("update code_cat set supercatid=? where catid=?",
-                        [self.categories[found]['supercatid'], self.categories[found]['catid']])
+                        [category['supercatid'], category['catid']])
             self.app.conn.commit()
             self.update_dialog_codes_and_categories()
             self.app.delete_backup = False
             return
 
         # find the code in the list
-        if item.text(1)[0:3] == 'cid':
-            found = -1
-            for i in range(0, len(self.codes)):
-                if self.codes[i]['cid'] == int(item.text(1)[4:]):
-                    found = i
-            if found == -1:
+        if item_type == 'cid':
+            code_ = self.codes_by_cid.get(item_id)
+            if code_ is None:
                 return
             if parent is None:
-                self.codes[found]['catid'] = None
+                code_['catid'] = None
             else:
-                if parent.text(1).split(':')[0] == 'cid':
+                parent_type, parent_id = tree_item_id(parent)
+                if parent_type == 'cid':
                     # Parent is code (leaf) cannot add child, but can merge
-                    self.merge_codes(self.codes[found], parent)
+                    self.merge_codes(code_, parent)
                     return
-                catid = int(parent.text(1).split(':')[1])
-                self.codes[found]['catid'] = catid
+                catid = parent_id
+                code_['catid'] = catid
 
             cur = self.app.conn.cursor()
             cur.execute("update code_name set catid=? where cid=?",
-                        [self.codes[found]['catid'], self.codes[found]['cid']])
+                        [code_['catid'], code_['cid']])
             self.app.conn.commit()
             self.app.delete_backup = False
             self.update_dialog_codes_and_categories()
@@ -2779,33 +2910,15 @@ class DialogCodeText(QtWidgets.QWidget):
             return
         cur = self.app.conn.cursor()
         old_cid = item['cid']
-        new_cid = int(parent.text(1).split(':')[1])
-        # Update cid for each coded segment in text, av, image. Delete where there is an Integrity error
-        ct_sql = "select ctid from code_text where cid=?"
-        cur.execute(ct_sql, [old_cid])
-        ct_res = cur.fetchall()
+        new_cid = tree_item_id(parent)[1]
+        # Update cid for the coded segments in text, av, image.
+        # Coded text that is already coded with the new code breaks unique(cid,fid,pos0,pos1,owner),
+        # so it is left by update or ignore and then deleted. code_av and code_image have no unique constraint.
         try:
-            for ct in ct_res:
-                try:
-                    cur.execute("update code_text set cid=? where ctid=?", [new_cid, ct[0]])
-                except sqlite3.IntegrityError:
-                    cur.execute("delete from code_text where ctid=?", [ct[0]])
-            av_sql = "select avid from code_av where cid=?"
-            cur.execute(av_sql, [old_cid])
-            av_res = cur.fetchall()
-            for av in av_res:
-                try:
-                    cur.execute("update code_av set cid=? where avid=?", [new_cid, av[0]])
-                except sqlite3.IntegrityError:
-                    cur.execute("delete from code_av where avid=?", [av[0]])
-            img_sql = "select imid from code_image where cid=?"
-            cur.execute(img_sql, [old_cid])
-            img_res = cur.fetchall()
-            for img in img_res:
-                try:
-                    cur.execute("update code_image set cid=? where imid=?", [new_cid, img[0]])
-                except sqlite3.IntegrityError:
-                    cur.execute("delete from code_image where imid=?", [img[0]])
+            cur.execute("update or ignore code_text set cid=? where cid=?", [new_cid, old_cid])
+            cur.execute("delete from code_text where cid=?", [old_cid])
+            cur.execute("update code_av set cid=? where cid=?", [new_cid, old_cid])
+            cur.execute("update code_image set cid=? where cid=?", [new_cid, old_cid])
             cur.execute("delete from code_name where cid=?", [old_cid, ])
             self.app.conn.commit()
         except Exception as e_:
@@ -2815,8 +2928,8 @@ class DialogCodeText(QtWidgets.QWidget):
         self.app.delete_backup = False
         msg = msg.replace("\n", " ")
         self.parent_textEdit.append(msg)
+        # Also updates the coded text and tooltips
         self.update_dialog_codes_and_categories()
-        self.get_coded_text_update_eventfilter_tooltips()
 
     def add_code(self, catid=None, code_name=""):
         """ Use add_item dialog to get new code text. Add_code_name dialog checks for
@@ -2855,20 +2968,61 @@ class DialogCodeText(QtWidgets.QWidget):
             # Can occur with in vivo coding
             print("in vivo coding. Code already exists")
             return False
-        self.update_dialog_codes_and_categories()
-        self.get_coded_text_update_eventfilter_tooltips()
+        parent_item = None
+        if catid is not None:
+            parent_item = self.tree_items_by_catid.get(catid)
+        if self.tree_sort_option == "cat and code asc" or (catid is not None and parent_item is None):
+            # Rebuild, to place the new code in name order
+            self.update_dialog_codes_and_categories()
+            return True
+        # Add the new code to the code data and tree, there is no coded text for it yet
+        # Codes are kept in lower case name order, as loaded by get_codes_categories
+        insort(self.codes, item, key=lambda c: c['name'].lower())
+        self.codes_by_cid[cid] = item
+        self.codes_by_name[item['name']] = item
+        insort(self.code_names_lower, (item['name'].lower(), cid), key=lambda n: n[0])
+        code_item = self.code_tree_item(item)
+        code_item.setText(3, "0")
+        with QtCore.QSignalBlocker(self.ui.treeWidget):
+            if parent_item is None:
+                self.ui.treeWidget.addTopLevelItem(code_item)
+            else:
+                parent_item.addChild(code_item)
+            self.sort_tree()
+        self.update_report_trees()
         return True
 
     def update_dialog_codes_and_categories(self):
         """ Update code and category tree here and in DialogReportCodes, ReportCoderComparisons, ReportCodeFrequencies
         Using try except blocks for each instance, as instance may have been deleted. """
-
         self.get_codes_and_categories()
         self.fill_tree()
         self.unlight()
         self.highlight()
         self.get_coded_text_update_eventfilter_tooltips()
+        self.update_report_trees()
+
+    def update_report_trees(self):
+        """ Update the code trees in the report widgets in the reports tab.
+        If the reports tab is hidden, the update waits until the tab is shown, see eventFilter,
+        or until this dialog is closed. So a series of code changes updates the reports once.
+        Called by: update_dialog_codes_and_categories, and by changes to one code or category
+        that update the code tree here in place. """
+
+        if self.tab_reports.isHidden():
+            self.report_trees_pending = True
+            return
+        self.fill_report_trees()
 
+    def fill_report_trees(self):
+        """ Get the codes and categories and fill the code trees of the report widgets in the reports tab.
+        Called by: update_report_trees, eventFilter, closeEvent """
+
+        self.report_trees_pending = False
+        # For isinstance()
+        from .reports import DialogReportCoderComparisons, DialogReportCodeFrequencies
+        from .report_codes import DialogReportCodes
+        from .report_code_summary import DialogReportCodeSummary
         contents = self.tab_reports.layout()
         if contents:
             for i in reversed(range(contents.count())):
@@ -2914,10 +3068,11 @@ class DialogCodeText(QtWidgets.QWidget):
             selected: QTreeWidgetItem
         """
 
-        if selected.text(1)[0:3] == 'cat':
+        item_type = tree_item_id(selected)[0]
+        if item_type == 'catid':
             self.delete_category(selected)
             return  # Avoid error as selected is now None
-        if selected.text(1)[0:3] == 'cid':
+        if item_type == 'cid':
             self.delete_code(selected)
 
     def delete_code(self, selected):
@@ -2926,34 +3081,44 @@ class DialogCodeText(QtWidgets.QWidget):
             selected: QTreeWidgetItem
         """
 
-        # Find the code in the list, check to delete
-        found = -1
-        for i in range(0, len(self.codes)):
-            if self.codes[i]['cid'] == int(selected.text(1)[4:]):
-                found = i
-        if found == -1:
+        # Find the code, check to delete
+        code_ = self.codes_by_cid.get(tree_item_id(selected)[1])
+        if code_ is None:
             return
-        code_ = self.codes[found]
         ui = DialogConfirmDelete(self.app, _("Code: ") + selected.text(0))
         ok = ui.exec()
         if not ok:
             return
         cur = self.app.conn.cursor()
-        cur.execute("delete from code_name where cid=?", [code_['cid'], ])
-        cur.execute("delete from code_text where cid=?", [code_['cid'], ])
-        cur.execute("delete from code_av where cid=?", [code_['cid'], ])
-        cur.execute("delete from code_image where cid=?", [code_['cid'], ])
-        self.app.conn.commit()
+        # Delete the code and its codings in one transaction
+        try:
+            for table in ("code_name", "code_text", "code_av", "code_image"):
+                cur.execute(f"delete from {table} where cid=?", [code_['cid'], ])
+            self.app.conn.commit()
+        except Exception as e_:
+            print(e_)
+            self.app.conn.rollback()  # Revert all changes
+            raise
         self.app.delete_backup = False
-        self.update_dialog_codes_and_categories()
         self.parent_textEdit.append(_("Code deleted: ") + code_['name'] + "\n")
         # Remove from recent codes
-        for item in self.recent_codes:
-            if item['name'] == code_['name']:
-                self.recent_codes.remove(item)
-                break
-        self.update_dialog_codes_and_categories()
-        self.app.delete_backup = False
+        self.recent_codes.pop(code_['cid'], None)
+        # Remove the code from the code data and tree
+        self.codes.remove(code_)
+        del self.codes_by_cid[code_['cid']]
+        self.codes_by_name.pop(code_['name'], None)
+        self.code_names_lower = [(c['name'].lower(), c['cid']) for c in self.codes]
+        self.tree_items_by_code_name.pop(code_['name'], None)
+        code_item = self.tree_items_by_cid.pop(code_['cid'], None)
+        if code_item is not None:
+            with QtCore.QSignalBlocker(self.ui.treeWidget):
+                if code_item.parent() is None:
+                    self.ui.treeWidget.takeTopLevelItem(self.ui.treeWidget.indexOfTopLevelItem(code_item))
+                else:
+                    code_item.parent().removeChild(code_item)
+        self.get_coded_text_update_eventfilter_tooltips()
+        self.fill_code_counts_in_tree()
+        self.update_report_trees()
 
     def delete_category(self, selected):
         """ Find category, remove from database, refresh categories and code data
@@ -2962,13 +3127,9 @@ class DialogCodeText(QtWidgets.QWidget):
             selected: QTreeWidgetItem
         """
 
-        found = -1
-        for i in range(0, len(self.categories)):
-            if self.categories[i]['catid'] == int(selected.text(1)[6:]):
-                found = i
-        if found == -1:
+        category = self.categories_by_catid.get(tree_item_id(selected)[1])
+        if category is None:
             return
-        category = self.categories[found]
         ui = DialogConfirmDelete(self.app, _("Category: ") + selected.text(0))
         ok = ui.exec()
         if not ok:
@@ -2988,53 +3149,49 @@ class DialogCodeText(QtWidgets.QWidget):
             selected: QTreeWidgetItem
         """
 
-        if selected.text(1)[0:3] == 'cid':
-            # Find the code in the list
-            found = -1
-            for i in range(0, len(self.codes)):
-                if self.codes[i]['cid'] == int(selected.text(1)[4:]):
-                    found = i
-            if found == -1:
+        item_type, item_id = tree_item_id(selected)
+        if item_type == 'cid':
+            # Find the code
+            code_ = self.codes_by_cid.get(item_id)
+            if code_ is None:
                 return
-            ui = DialogMemo(self.app, _("Memo for Code: ") + self.codes[found]['name'], self.codes[found]['memo'])
+            ui = DialogMemo(self.app, _("Memo for Code: ") + code_['name'], code_['memo'])
             ui.exec()
             memo = ui.memo
-            if memo != self.codes[found]['memo']:
-                self.codes[found]['memo'] = memo
+            if memo != code_['memo']:
+                code_['memo'] = memo
                 cur = self.app.conn.cursor()
-                cur.execute("update code_name set memo=? where cid=?", (memo, self.codes[found]['cid']))
+                cur.execute("update code_name set memo=? where cid=?", (memo, code_['cid']))
                 self.app.conn.commit()
                 self.app.delete_backup = False
             if memo == "":
                 selected.setData(2, QtCore.Qt.ItemDataRole.DisplayRole, "")
             else:
                 selected.setData(2, QtCore.Qt.ItemDataRole.DisplayRole, _("Memo"))
-                self.parent_textEdit.append(_("Memo for code: ") + self.codes[found]['name'])
-
-        if selected.text(1)[0:3] == 'cat':
-            # Find the category in the list
-            found = -1
-            for i in range(0, len(self.categories)):
-                if self.categories[i]['catid'] == int(selected.text(1)[6:]):
-                    found = i
-            if found == -1:
+                self.parent_textEdit.append(_("Memo for code: ") + code_['name'])
+
+        if item_type == 'catid':
+            # Find the category
+            category = self.categories_by_catid.get(item_id)
+            if category is None:
                 return
-            ui = DialogMemo(self.app, _("Memo for Category: ") + self.categories[found]['name'],
-                            self.categories[found]['memo'])
+            ui = DialogMemo(self.app, _("Memo for Category: ") + category['name'], category['memo'])
             ui.exec()
             memo = ui.memo
-            if memo != self.categories[found]['memo']:
-                self.categories[found]['memo'] = memo
+            if memo != category['memo']:
+                category['memo'] = memo
                 cur = self.app.conn.cursor()
-                cur.execute("update code_cat set memo=? where catid=?", (memo, self.categories[found]['catid']))
+                cur.execute("update code_cat set memo=? where catid=?", (memo, category['catid']))
                 self.app.conn.commit()
                 self.app.delete_backup = False
             if memo == "":
                 selected.setData(2, QtCore.Qt.ItemDataRole.DisplayRole, "")
             else:
                 selected.setData(2, QtCore.Qt.ItemDataRole.DisplayRole, _("Memo"))
-                self.parent_textEdit.append(_("Memo for category: ") + self.categories[found]['name'])
-        self.update_dialog_codes_and_categories()
+                self.parent_textEdit.append(_("Memo for category: ") + category['name'])
+        # The memo column is updated here, so only the report trees are updated
+        selected.setToolTip(2, memo)
+        self.update_report_trees()
 
     def rename_category_or_code(self, selected):
         """ Rename a code or category.
@@ -3042,11 +3199,11 @@ class DialogCodeText(QtWidgets.QWidget):
         Args:
             selected : QTreeWidgetItem """
 
-        if selected.text(1)[0:3] == 'cid':
-            code_ = None
-            for c in self.codes:
-                if c['cid'] == int(selected.text(1)[4:]):
-                    code_ = c
+        item_type, item_id = tree_item_id(selected)
+        if item_type == 'cid':
+            code_ = self.codes_by_cid.get(item_id)
+            if code_ is None:
+                return
             new_name, ok = QtWidgets.QInputDialog.getText(self, _("Rename code"),
                                                           _("New code name:") + " " * 40,
                                                           QtWidgets.QLineEdit.EchoMode.Normal,
@@ -3054,64 +3211,62 @@ class DialogCodeText(QtWidgets.QWidget):
             if not ok or new_name == '':
                 return
             # Check that no other code has this name
-            for c in self.codes:
-                if c['name'] == new_name:
-                    Message(self.app, _("Name in use"),
-                            new_name + _(" is already in use, choose another name."), "warning").exec()
-                    return
-            # Find the code in the list
-            found = -1
-            for i in range(0, len(self.codes)):
-                if self.codes[i]['cid'] == int(selected.text(1)[4:]):
-                    found = i
-            if found == -1:
+            if new_name in self.codes_by_name:
+                Message(self.app, _("Name in use"),
+                        new_name + _(" is already in use, choose another name."), "warning").exec()
                 return
-            # Rename in recent codes
-            for item in self.recent_codes:
-                if item['name'] == self.codes[found]['name']:
-                    item['name'] = new_name
-                    break
             # Update codes list and database
             cur = self.app.conn.cursor()
-            cur.execute("update code_name set name=? where cid=?", (new_name, self.codes[found]['cid']))
+            cur.execute("update code_name set name=? where cid=?", (new_name, code_['cid']))
             self.app.conn.commit()
             self.app.delete_backup = False
-            old_name = self.codes[found]['name']
+            old_name = code_['name']
             self.parent_textEdit.append(_("Code renamed from: ") + old_name + _(" to: ") + new_name)
-            self.update_dialog_codes_and_categories()
+            # Rename in the code data and tree
+            code_['name'] = new_name
+            self.codes_by_name[new_name] = self.codes_by_name.pop(old_name)
+            self.code_names_lower = [(c['name'].lower(), c['cid']) for c in self.codes]
+            self.tree_items_by_code_name[new_name] = self.tree_items_by_code_name.pop(old_name, selected)
+            self.set_tree_item_name(selected, new_name)
+            if not self.sort_tree():
+                self.update_dialog_codes_and_categories()
+                return
+            # Code names are shown in the coded text tooltips
+            self.get_coded_text_update_eventfilter_tooltips()
+            self.update_report_trees()
             return
 
-        if selected.text(1)[0:3] == 'cat':
-            cat = None
-            for c in self.categories:
-                if c['catid'] == int(selected.text(1)[6:]):
-                    cat = c
+        if item_type == 'catid':
+            cat = self.categories_by_catid.get(item_id)
+            if cat is None:
+                return
             new_name, ok = QtWidgets.QInputDialog.getText(self, _("Rename category"),
                                                           _("New category name:") + " " * 40,
                                                           QtWidgets.QLineEdit.EchoMode.Normal, cat['name'])
             if not ok or new_name == '':
                 return
             # Check that no other category has this name
-            for c in self.categories:
-                if c['name'] == new_name:
-                    msg = _("This code name is already in use.")
-                    Message(self.app, _("Duplicate code name"), msg, "warning").exec()
-                    return
-            # Find the category in the list
-            found = -1
-            for i in range(0, len(self.categories)):
-                if self.categories[i]['catid'] == int(selected.text(1)[6:]):
-                    found = i
-            if found == -1:
+            if any(c['name'] == new_name for c in self.categories):
+                msg = _("This code name is already in use.")
+                Message(self.app, _("Duplicate code name"), msg, "warning").exec()
                 return
             # Update category list and database
             cur = self.app.conn.cursor()
-            cur.execute("update code_cat set name=? where catid=?",
-                        (new_name, self.categories[found]['catid']))
+            cur.execute("update code_cat set name=? where catid=?", (new_name, cat['catid']))
             self.app.conn.commit()
             self.app.delete_backup = False
-            old_name = self.categories[found]['name']
-            self.update_dialog_codes_and_categories()
+            old_name = cat['name']
+            # Rename in the category data and tree
+            cat['name'] = new_name
+            selected.setText(0, new_name)
+            selected.setToolTip(0, '')
+            if len(new_name) > 52:
+                selected.setText(0, f"{new_name[:25]}..{new_name[-25:]}")
+                selected.setToolTip(0, new_name)
+            if self.sort_tree():
+                self.update_report_trees()
+            else:
+                self.update_dialog_codes_and_categories()
             self.parent_textEdit.append(_("Category renamed from: ") + old_name + _(" to: ") + new_name)
 
     def change_code_color(self, selected):
@@ -3119,29 +3274,28 @@ class DialogCodeText(QtWidgets.QWidget):
         Args:
             selected : QTreeWidgetItem """
 
-        cid = int(selected.text(1)[4:])
-        found = -1
-        for i in range(0, len(self.codes)):
-            if self.codes[i]['cid'] == cid:
-                found = i
-        if found == -1:
+        code_ = self.codes_by_cid.get(tree_item_id(selected)[1])
+        if code_ is None:
             return
-        ui = DialogColorSelect(self.app, self.codes[found])
+        ui = DialogColorSelect(self.app, code_)
         ok = ui.exec()
         if not ok:
             return
         new_color = ui.get_color()
         if new_color is None:
             return
-        selected.setBackground(0, QBrush(QColor(new_color), Qt.BrushStyle.SolidPattern))
+        background, foreground = code_color_brushes(new_color)
+        selected.setBackground(0, background)
+        selected.setForeground(0, foreground)
         # Update codes list, database and color markings
-        self.codes[found]['color'] = new_color
+        code_['color'] = new_color
         cur = self.app.conn.cursor()
-        cur.execute("update code_name set color=? where cid=?",
-                    (self.codes[found]['color'], self.codes[found]['cid']))
+        cur.execute("update code_name set color=? where cid=?", (code_['color'], code_['cid']))
         self.app.conn.commit()
         self.app.delete_backup = False
-        self.update_dialog_codes_and_categories()
+        # The tooltips hold the code colours, this also updates the text highlights
+        self.get_coded_text_update_eventfilter_tooltips()
+        self.update_report_trees()
 
     def file_menu(self, position):
         """ Context menu for listWidget files to get to the next file and
@@ -3170,10 +3324,9 @@ class DialogCodeText(QtWidgets.QWidget):
         action_show_by_attribute = None
         action_memo = menu.addAction(_("Open memo"))
         action_view_original_text = None
-        if file_ is not None and file_['mediapath'] is not None and len(file_['mediapath']) > 6 and \
-                (file_['mediapath'][:6] == '/docs/' or file_['mediapath'][:5] == 'docs:'):
+        if file_ is not None and original_text_path(self.app.project_path, file_['mediapath']) is not None:
             action_view_original_text = menu.addAction(_("view original text file"))
-        if len(self.app.get_text_filenames()) > 1:
+        if len(self.filenames) > 1:
             if len(self.files) != 1:
                 action_next = menu.addAction(_("Next file"))
             action_latest = menu.addAction(_("File with latest coding"))
@@ -3239,12 +3392,9 @@ class DialogCodeText(QtWidgets.QWidget):
          param:
          mediapath: String '/docs/' for internal 'docs:/' for external """
 
-        if self.file_['mediapath'][:6] == "/docs/":
-            doc_path = self.app.project_path + "/documents/" + self.file_['mediapath'][6:]
-            webbrowser.open(doc_path)
-            return
-        if self.file_['mediapath'][:5] == "docs:":
-            doc_path = self.file_['mediapath'][5:]
+        import webbrowser
+        doc_path = original_text_path(self.app.project_path, self.file_['mediapath'])
+        if doc_path is not None:
             webbrowser.open(doc_path)
             return
         logger.error("Cannot open text file in browser " + self.file_['mediapath'])
@@ -3290,10 +3440,9 @@ class DialogCodeText(QtWidgets.QWidget):
         if text_ == "":
             self.get_files()
             return
-        cur = self.app.conn.cursor()
-        cur.execute('select id from source where name like ?', ['%' + text_ + '%'])
-        res = cur.fetchall()
-        file_ids = [r[0] for r in res]
+        # Match the loaded text file names, rather than querying with a leading wildcard sql like
+        text_ = text_.lower()
+        file_ids = [f['id'] for f in self.filenames if text_ in f['name'].lower()]
         self.get_files(file_ids)
 
     def prev_chars(self, file_, selected):
@@ -3305,24 +3454,18 @@ class DialogCodeText(QtWidgets.QWidget):
         # Already at start
         if file_['start'] == 0:
             return
+        self.get_file_fulltext(file_)
         file_['end'] = file_['start']
         file_['start'] = file_['start'] - self.app.settings['codetext_chunksize']
-        # Forward track to the first line ending for a better start of text chunk
-        line_ending = False
-        i = 0
-        try:
-            while file_['start'] + i < file_['end'] and not line_ending:
-                if file_['fulltext'][file_[
-                                         'start'] + i - 1] == "\n":  # ... + i - 1] because we want to include the line break in the chunk, and text[start:i] would otherwise exclude it
-                    line_ending = True
-                else:
-                    i += 1
-        except IndexError:
-            pass
-        file_['start'] += i
         # Check displayed text not going before start of characters
         if file_['start'] < 0:
             file_['start'] = 0
+        else:
+            # Forward track to the first line ending for a better start of text chunk
+            # Search from start - 1, because the line break ends the previous chunk
+            line_ending = file_['fulltext'].find("\n", file_['start'] - 1, file_['end'] - 1)
+            if line_ending != -1:
+                file_['start'] = line_ending + 1
         # Update tooltip for listItem
         tt = selected.toolTip()
         tt2 = tt.split("From: ")[0]
@@ -3337,44 +3480,30 @@ class DialogCodeText(QtWidgets.QWidget):
             file_  : selected file, Dictionary
             selected:  list widget item """
 
+        self.get_file_fulltext(file_)
         # First time
         if file_['start'] == 0 and file_['end'] == file_['characters']:
-            # Backtrack to the first line ending for a better end of text chunk
-            i = self.app.settings['codetext_chunksize']
-            line_ending = False
-            while i > 0 and not line_ending:
-                if file_['fulltext'][
-                    i - 1] == "\n":  # [i - 1] because we want to include the line break in the chunk, and text[start:i] would otherwise exclude it
-                    line_ending = True
-                else:
-                    i -= 1
-            if i <= 0:
+            # Backtrack to the last line ending for a better end of text chunk
+            # The line break is included in the chunk, as text[start:end] excludes end
+            line_ending = file_['fulltext'].rfind("\n", 0, self.app.settings['codetext_chunksize'])
+            if line_ending == -1:
                 file_['end'] = self.app.settings['codetext_chunksize']
             else:
-                file_['end'] = i
+                file_['end'] = line_ending + 1
         else:
             file_['start'] = file_['start'] + self.app.settings['codetext_chunksize']
             # Backtrack from start to next line ending for a better start of text chunk
-            line_ending = False
-            try:
-                while file_['start'] > 0 and not line_ending:
-                    if file_['fulltext'][file_['start'] - 1] == "\n":
-                        line_ending = True
-                    else:
-                        file_['start'] -= 1
-            except IndexError:
-                pass
+            if file_['start'] <= len(file_['fulltext']):
+                file_['start'] = file_['fulltext'].rfind("\n", 0, file_['start']) + 1
             # Backtrack from end to next line ending for a better end of text chunk
             i = self.app.settings['codetext_chunksize']
             if file_['start'] + i >= file_['characters']:
-                i = file_['characters'] - file_['start'] - 1  # To prevent Index out of range error
-            line_ending = False
-            while i > 0 and not line_ending:
-                if file_['fulltext'][file_['start'] + i - 1] == "\n":
-                    line_ending = True
-                else:
-                    i -= 1
-            file_['end'] = file_['start'] + i
+                i = file_['characters'] - file_['start'] - 1
+            line_ending = file_['fulltext'].rfind("\n", file_['start'], file_['start'] + i)
+            if line_ending == -1:
+                file_['end'] = file_['start'] + i
+            else:
+                file_['end'] = line_ending + 1
             # Check displayed text going past end of characters
             if file_['end'] >= file_['characters']:
                 file_['end'] = file_['characters'] - 1
@@ -3495,33 +3624,36 @@ class DialogCodeText(QtWidgets.QWidget):
         if file_ is None:
             return
         self.ui.listWidget.blockSignals(True)
-        for x in range(self.ui.listWidget.count()):
-            if self.ui.listWidget.item(x).text() == file_['name']:
-                self.ui.listWidget.setCurrentRow(x)
-                break
+        row = self.file_rows_by_name.get(file_['name'])
+        if row is not None:
+            self.ui.listWidget.setCurrentRow(row)
         self.ui.listWidget.blockSignals(False)
         self.file_ = file_
         if "start" not in self.file_:
             self.file_['start'] = 0
         sql_values = []
-        try:
-            file_result = self.app.get_file_texts([file_['id']])[0]
-        except IndexError:
-            # Error occurs when file opened here but also deleted in ManageFiles
-            self.file_ = None
-            return
+        # The fulltext is kept in the file dictionary, so that moving between text chunks does not re-read it
+        if self.file_.get('fulltext') is None:
+            try:
+                self.file_['fulltext'] = self.app.get_file_texts([file_['id']])[0]['fulltext']
+            except IndexError:
+                # Error occurs when file opened here but also deleted in ManageFiles
+                self.file_ = None
+                return
+        fulltext = self.file_['fulltext']
         if "end" not in self.file_:
-            self.file_['end'] = len(file_result['fulltext'])
-        sql_values.append(int(file_result['id']))
+            self.file_['end'] = len(fulltext)
+        sql_values.append(int(file_['id']))
         # Determine start line
         if self.file_['start'] == 0:
             self.file_['start_line'] = 1
         else:
-            text_before = file_result['fulltext'][0:self.file_['start']]
+            text_before = fulltext[0:self.file_['start']]
             lines = text_before.splitlines()
             self.file_['start_line'] = len(lines) + 1
+        self.init_number_bar()
         self.number_bar.set_first_line(self.file_['start_line'], do_update=False)
-        self.text = file_result['fulltext'][self.file_['start']:self.file_['end']]
+        self.text = fulltext[self.file_['start']:self.file_['end']]
         if self.text.endswith('\n'):
             self.text = self.text[
                         :-1]  # having '\n' at the end of the text sometimes creates an empty line in QTextEdit, so we omit it
@@ -3549,6 +3681,8 @@ class DialogCodeText(QtWidgets.QWidget):
 
         if self.file_ is None:
             return
+        # Resized codings waiting for the save timer are written first, so the reload includes them
+        self.write_resized_codes()
         sql_values = [int(self.file_['id']), self.app.settings['codername'], self.file_['start'], self.file_['end']]
         # Get code text for this file and for this coder
         self.code_text = []
@@ -3566,6 +3700,7 @@ class DialogCodeText(QtWidgets.QWidget):
         keys = 'ctid', 'cid', 'fid', 'seltext', 'pos0', 'pos1', 'owner', 'date', 'memo', 'important', 'name'
         for row in code_results:
             self.code_text.append(dict(zip(keys, row)))
+        self.index_code_text()
         # Update filter for tooltip and redo formatting
         if self.important:
             imp_coded = []
@@ -3580,9 +3715,29 @@ class DialogCodeText(QtWidgets.QWidget):
         self.unlight()
         self.highlight()
 
+    def index_code_text(self):
+        """ Index code_text by pos0, so the codes at a text position are found without scanning all of code_text.
+        Also index by cid, in pos0 order, for the show selected code next and previous buttons.
+        Called by: get_coded_text_update_eventfilter_tooltips, get_files """
+
+        self.code_text_pos0_index = index_by_pos0(self.code_text)
+        self.code_text_by_cid = {}
+        for i in self.code_text_pos0_index[0]:
+            self.code_text_by_cid.setdefault(self.code_text[i]['cid'], []).append(self.code_text[i])
+        self.code_text_pos0s_by_cid = {cid: [ct['pos0'] for ct in items] for cid, items in self.code_text_by_cid.items()}
+
+    def codes_at_position(self, pos):
+        """ Get the coded texts that contain this position, see codings_at_position.
+        param: pos : Integer position in the full text
+        returns: List of code_text dictionaries, in code_text order
+        """
+
+        return codings_at_position(self.code_text, self.code_text_pos0_index, pos)
+
     def unlight(self):
         """ Remove all text highlighting from current file. """
 
+        self.ui.textEdit.setExtraSelections([])
         if self.text is None or self.text == "":
             return
         cursor = self.ui.textEdit.textCursor()
@@ -3598,53 +3753,59 @@ class DialogCodeText(QtWidgets.QWidget):
         For defined colours in color_selector, make text light on dark, and conversely dark on light
         """
 
-        if self.file_ is None or self.ui.textEdit.toPlainText() == "":
+        if self.file_ is None or self.ui.textEdit.document().isEmpty():
             return
-        # Add coding highlights
-        codes = {x['cid']: x for x in self.codes}
-        for item in self.code_text:
-            fmt = QtGui.QTextCharFormat()
-            cursor = self.ui.textEdit.textCursor()
-            cursor.setPosition(int(item['pos0'] - self.file_['start']), QtGui.QTextCursor.MoveMode.MoveAnchor)
-            cursor.setPosition(int(item['pos1'] - self.file_['start']), QtGui.QTextCursor.MoveMode.KeepAnchor)
-            color = codes.get(item['cid'], {}).get('color', "#777777")  # default gray
-            brush = QBrush(QColor(color))
-            fmt.setBackground(brush)
-            # Foreground depends on the defined need_white_text color in color_selector
-            text_brush = QBrush(QColor(TextColor(color).recommendation))
-            fmt.setForeground(text_brush)
-            # Highlight codes with memos - these are italicised
-            # Italics also used for overlapping codes
-            if item['memo'] != "":
-                fmt.setFontItalic(True)
-            else:
-                fmt.setFontItalic(False)
-            # Bold important codes
-            if item['important']:
-                fmt.setFontWeight(QtGui.QFont.Weight.Bold)
-            # Use important flag for ONLY showing important codes (button selected)
-            if self.important and item['important'] == 1:
-                cursor.setCharFormat(fmt)
-            # Show all codes, as important button not selected
-            if not self.important:
-                cursor.setCharFormat(fmt)
-
-        # Add annotation marks - these are in bold, important codings are also bold
-        for note in self.annotations:
-            if len(self.file_.keys()) > 0:  # will be zero if using autocode and no file is loaded
-                # Cursor pos could be negative if annotation was for an earlier text portion
+        # One edit block, so the document lays out and signals changes once, not for each format change
+        edit_block_cursor = QtGui.QTextCursor(self.ui.textEdit.document())
+        edit_block_cursor.beginEditBlock()
+        try:
+            # Add coding highlights
+            for item in self.code_text:
+                fmt = QtGui.QTextCharFormat()
                 cursor = self.ui.textEdit.textCursor()
-                if note['fid'] == self.file_['id'] and \
-                        0 <= int(note['pos0']) - self.file_['start'] < int(note['pos1']) - self.file_['start'] <= \
-                        len(self.ui.textEdit.toPlainText()):
-                    cursor.setPosition(int(note['pos0']) - self.file_['start'],
-                                       QtGui.QTextCursor.MoveMode.MoveAnchor)
-                    cursor.setPosition(int(note['pos1']) - self.file_['start'],
-                                       QtGui.QTextCursor.MoveMode.KeepAnchor)
-                    format_bold = QtGui.QTextCharFormat()
-                    format_bold.setFontWeight(QtGui.QFont.Weight.Bold)
-                    cursor.mergeCharFormat(format_bold)
-        self.apply_underline_to_overlaps()
+                cursor.setPosition(int(item['pos0'] - self.file_['start']), QtGui.QTextCursor.MoveMode.MoveAnchor)
+                cursor.setPosition(int(item['pos1'] - self.file_['start']), QtGui.QTextCursor.MoveMode.KeepAnchor)
+                code_ = self.codes_by_cid.get(item['cid'], {})
+                color = code_.get('color', "#777777")  # default gray
+                # Foreground depends on the defined need_white_text color in color_selector
+                background, foreground = code_color_brushes(color)
+                fmt.setBackground(background)
+                fmt.setForeground(foreground)
+                # Highlight codes with memos - these are italicised
+                # Italics also used for overlapping codes
+                if item['memo'] != "":
+                    fmt.setFontItalic(True)
+                else:
+                    fmt.setFontItalic(False)
+                # Bold important codes
+                if item['important']:
+                    fmt.setFontWeight(QtGui.QFont.Weight.Bold)
+                # Use important flag for ONLY showing important codes (button selected)
+                if self.important and item['important'] == 1:
+                    cursor.setCharFormat(fmt)
+                # Show all codes, as important button not selected
+                if not self.important:
+                    cursor.setCharFormat(fmt)
+
+            # Add annotation marks - these are in bold, important codings are also bold
+            text_length = self.text_edit_length()
+            for note in self.annotations:
+                if len(self.file_.keys()) > 0:  # will be zero if using autocode and no file is loaded
+                    # Cursor pos could be negative if annotation was for an earlier text portion
+                    cursor = self.ui.textEdit.textCursor()
+                    if note['fid'] == self.file_['id'] and \
+                            0 <= int(note['pos0']) - self.file_['start'] < int(note['pos1']) - self.file_['start'] <= \
+                            text_length:
+                        cursor.setPosition(int(note['pos0']) - self.file_['start'],
+                                           QtGui.QTextCursor.MoveMode.MoveAnchor)
+                        cursor.setPosition(int(note['pos1']) - self.file_['start'],
+                                           QtGui.QTextCursor.MoveMode.KeepAnchor)
+                        format_bold = QtGui.QTextCharFormat()
+                        format_bold.setFontWeight(QtGui.QFont.Weight.Bold)
+                        cursor.mergeCharFormat(format_bold)
+            self.apply_underline_to_overlaps()
+        finally:
+            edit_block_cursor.endEditBlock()
 
     def apply_underline_to_overlaps(self):
         """ Apply underline format to coded text sections which are overlapping.
@@ -3694,9 +3855,9 @@ class DialogCodeText(QtWidgets.QWidget):
         if item is None:
             Message(self.app, _('Warning'), _("No code was selected"), "warning").exec()
             return
-        if item.text(1).split(':')[0] == 'catid':  # Cannot mark with category
+        if tree_item_id(item)[0] == 'catid':  # Cannot mark with category
             return
-        cid = int(item.text(1).split(':')[1])
+        cid = tree_item_id(item)[1]
         selected_text = self.ui.textEdit.textCursor().selectedText()
         pos0 = self.ui.textEdit.textCursor().selectionStart() + self.file_['start']
         pos1 = self.ui.textEdit.textCursor().selectionEnd() + self.file_['start']
@@ -3757,24 +3918,13 @@ class DialogCodeText(QtWidgets.QWidget):
         self.get_coded_text_update_eventfilter_tooltips()
         self.fill_code_counts_in_tree()
         # Update recent_codes
-        tmp_code = None
-        for c in self.codes:
-            if c['cid'] == cid:
-                tmp_code = c
+        tmp_code = self.codes_by_cid.get(cid)
         if tmp_code is None:
             return
         # Need to remove from recent_codes, if there and add back in first position, and update project recently_used_codes
-        for item in self.recent_codes:
-            if item == tmp_code:
-                self.recent_codes.remove(item)
-                break
-        self.recent_codes.insert(0, tmp_code)
-        if len(self.recent_codes) > 10:
-            self.recent_codes = self.recent_codes[:10]
-        recent_codes_string = ""
-        for r in self.recent_codes:
-            recent_codes_string += f" {r['cid']}"
-        recent_codes_string = recent_codes_string[1:]
+        self.recent_codes.pop(tmp_code['cid'], None)
+        self.recent_codes = {tmp_code['cid']: tmp_code, **dict(list(self.recent_codes.items())[:9])}
+        recent_codes_string = " ".join(str(cid_) for cid_ in self.recent_codes)
         cur.execute("update project set recently_used_codes=?", [recent_codes_string])
         self.app.conn.commit()
 
@@ -3812,11 +3962,9 @@ class DialogCodeText(QtWidgets.QWidget):
         if self.file_ is None:
             return
         self.clear_edit_variables()
-        unmarked_list = []
-        for item in self.code_text:
-            if item['pos0'] <= location + self.file_['start'] <= item['pos1'] and \
-                    item['owner'] == self.app.settings['codername']:
-                unmarked_list.append(item)
+        coder = self.app.settings['codername']
+        unmarked_list = [item for item in self.codes_at_position(location + self.file_['start'])
+                         if item['owner'] == coder]
         if not unmarked_list:
             return
         to_unmark = []
@@ -3831,12 +3979,11 @@ class DialogCodeText(QtWidgets.QWidget):
             to_unmark = ui.get_selected()
         if to_unmark is None:
             return
-        self.undo_deleted_codes = deepcopy(to_unmark)
+        self.undo_deleted_codes = [dict(item) for item in to_unmark]
         # Delete from db, remove from coding and update highlights
         cur = self.app.conn.cursor()
-        for item in to_unmark:
-            cur.execute("delete from code_text where ctid=?", [item['ctid']])
-            self.app.conn.commit()
+        cur.executemany("delete from code_text where ctid=?", [(item['ctid'],) for item in to_unmark])
+        self.app.conn.commit()
         # Update filter for tooltip and update code colours
         self.get_coded_text_update_eventfilter_tooltips()
         self.fill_code_counts_in_tree()
@@ -3857,7 +4004,7 @@ class DialogCodeText(QtWidgets.QWidget):
         self.clear_edit_variables()
         pos0 = self.ui.textEdit.textCursor().selectionStart()
         pos1 = self.ui.textEdit.textCursor().selectionEnd()
-        text_length = len(self.ui.textEdit.toPlainText())
+        text_length = self.text_edit_length()
         if pos0 >= text_length or pos1 > text_length:
             return
         item = None
@@ -3958,7 +4105,7 @@ class DialogCodeText(QtWidgets.QWidget):
 
         self.clear_edit_variables()
         item = self.ui.treeWidget.currentItem()
-        if item is None or item.text(1)[0:3] == 'cat':
+        if item is None or tree_item_id(item)[0] == 'catid':
             Message(self.app, _('Warning'), _("No code was selected"), "warning").exec()
             return
         ui = DialogGetStartAndEndMarks("Autocoding", "Autocoding surround")  # self.file_['name'], self.file_['name'])
@@ -3986,8 +4133,9 @@ class DialogCodeText(QtWidgets.QWidget):
         msg = _("Code text using start and end marks: ")  # + self.file_['name']
         msg += _("\nUsing ") + start_mark + _(" and ") + end_mark + "\n"
         cur = self.app.conn.cursor()
-        cid = int(item.text(1)[4:])
+        cid = tree_item_id(item)[1]
         now_date = datetime.datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S")
+        coder = self.app.settings['codername']
 
         # Find text chunks and insert coded into database
         already_assigned = 0
@@ -4009,20 +4157,19 @@ class DialogCodeText(QtWidgets.QWidget):
                         pos1 = text_ends[text_end_iterator]
                         # Check if already coded in this file for this coder
                         sql = "select cid from code_text where cid=? and fid=? and pos0=? and pos1=? and owner=?"
-                        cur.execute(sql, [cid, f['id'], start_pos, pos1, self.app.settings['codername']])
+                        cur.execute(sql, [cid, f['id'], start_pos, pos1, coder])
                         res = cur.fetchone()
                         if res is None:
                             seltext = f['fulltext'][start_pos: pos1]
                             sql = "insert into code_text (cid, fid, seltext, pos0, pos1, owner, date, memo) values(?,?,?,?,?,?,?,?)"
                             '''cur.execute(sql, (cid, self.file_['id'], seltext, start_pos, pos1,
                                               self.app.settings['codername'], now_date, ""))'''
-                            cur.execute(sql, (cid, f['id'], seltext, start_pos, pos1,
-                                              self.app.settings['codername'], now_date, ""))
+                            cur.execute(sql, (cid, f['id'], seltext, start_pos, pos1, coder, now_date, ""))
                             # Add to undo auto-coding history
                             undo = {
                                 "sql": "delete from code_text where cid=? and fid=? and pos0=? and pos1=? and owner=?",
                                 "cid": cid, "fid": f['id'], "pos0": start_pos, "pos1": pos1,
-                                "owner": self.app.settings['codername']
+                                "owner": coder
                                 }
                             undo_list.append(undo)
                             entries += 1
@@ -4095,11 +4242,11 @@ class DialogCodeText(QtWidgets.QWidget):
         if len(files) == 0:
             return
         item = self.ui.treeWidget.currentItem()
-        if item is None or item.text(1)[0:3] == 'cat':
+        if item is None or tree_item_id(item)[0] == 'catid':
             Message(self.app, _('Warning'), _("No code was selected"), "warning").exec()
             return
         self.clear_edit_variables()
-        cid = int(item.text(1).split(':')[1])
+        cid = tree_item_id(item)[1]
         dialog = QtWidgets.QInputDialog(None)
         dialog.setStyleSheet("* {font-size:" + str(self.app.settings['fontsize']) + "pt} ")
         dialog.setWindowTitle(_("Code sentence"))
@@ -4133,6 +4280,7 @@ class DialogCodeText(QtWidgets.QWidget):
         cur = self.app.conn.cursor()
         msg = ""
         undo_list = []
+        coder = self.app.settings['codername']
 
         # Regex
         regex_pattern = None
@@ -4153,20 +4301,22 @@ class DialogCodeText(QtWidgets.QWidget):
                 surround_codes = []
                 if self.autocode_frag_all_first_within.startswith("code_within_code"):
                     cur.execute("select pos0,pos1 from code_text where cid=? and fid=? and owner=?",
-                                [int(self.autocode_frag_all_first_within.split()[1]), f['id'], self.app.settings['codername']])
+                                [int(self.autocode_frag_all_first_within.split()[1]), f['id'], coder])
                     surround_codes = cur.fetchall()
                     #print("Outer cid", int(self.autocode_frag_all_within.split()[1]))
                     #for s in surround_codes:
                     #    print(s)
                     if not surround_codes:
+                        self.app.conn.commit()
                         return
 
+                # One date for all codings in this file
+                now_date = datetime.datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S")
                 for sentence in sentences:
                     if (find_text in sentence and not regex_pattern) or (regex_pattern and regex_pattern.search(sentence)):
                         i = {'cid': cid, 'fid': int(f['id']), 'seltext': str(sentence),
                              'pos0': pos0, 'pos1': pos0 + len(sentence),
-                             'owner': self.app.settings['codername'], 'memo': "",
-                             'date': datetime.datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S")}
+                             'owner': coder, 'memo': "", 'date': now_date}
                         # For code within a code, if selected
                         found_code_in_code = False
                         if self.autocode_frag_all_first_within.startswith("code_within_code"):
@@ -4189,7 +4339,6 @@ class DialogCodeText(QtWidgets.QWidget):
                                     "owner": i['owner']
                                 }
                                 undo_list.append(undo)
-                                self.app.conn.commit()
                             except Exception as e:  # Possible Unique constraint fail
                                 print("Autocode insert error ", str(e))
                                 logger.debug(_("Autocode insert error ") + str(e))
@@ -4198,6 +4347,7 @@ class DialogCodeText(QtWidgets.QWidget):
                         break
                 if codes_added > 0:
                     msg += _("File: ") + f"{f['name']} {codes_added}" + _(" added codes") + "\n"
+            self.app.conn.commit()
         except Exception as e_:
             print(e_)
             self.app.conn.rollback()  # revert all changes
@@ -4227,10 +4377,10 @@ class DialogCodeText(QtWidgets.QWidget):
         """
 
         code_item = self.ui.treeWidget.currentItem()
-        if code_item is None or code_item.text(1)[0:3] == 'cat':
+        if code_item is None or tree_item_id(code_item)[0] == 'catid':
             Message(self.app, _('Warning'), _("No code was selected"), "warning").exec()
             return
-        cid = int(code_item.text(1).split(':')[1])
+        cid = tree_item_id(code_item)[1]
         # Input dialog too narrow, so code below to widen dialog
         dialog = QtWidgets.QInputDialog(None)
         dialog.setStyleSheet("* {font-size:" + str(self.app.settings['fontsize']) + "pt} ")
@@ -4279,6 +4429,7 @@ class DialogCodeText(QtWidgets.QWidget):
 
         undo_list = []
         cur = self.app.conn.cursor()
+        coder = self.app.settings['codername']
         try:
             for find_txt in find_texts:
                 filenames = ""
@@ -4314,7 +4465,7 @@ class DialogCodeText(QtWidgets.QWidget):
                     # Trim to within_existing_code instances if this option is selected
                     if self.autocode_all_first_last_within.startswith("code_within_code"):
                         cur.execute("select pos0,pos1 from code_text where cid=? and fid=? and owner=?",
-                                    [int(self.autocode_all_first_last_within.split()[1]), f['id'], self.app.settings['codername']])
+                                    [int(self.autocode_all_first_last_within.split()[1]), f['id'], coder])
                         res = cur.fetchall()
                         within_starts = []
                         within_ends = []
@@ -4328,12 +4479,12 @@ class DialogCodeText(QtWidgets.QWidget):
                     if not text_starts:
                         return
 
-                    # Add new items to database
+                    # Add new items to database, with one date for all codings in this file
+                    now_date = datetime.datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S")
                     for index in range(len(text_starts)):
                         item = {'cid': cid, 'fid': int(f['id']), 'seltext': str(find_txt),
                                 'pos0': text_starts[index], 'pos1': text_ends[index],
-                                'owner': self.app.settings['codername'], 'memo': "",
-                                'date': datetime.datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S")}
+                                'owner': coder, 'memo': "", 'date': now_date}
                         try:
                             cur.execute("insert into code_text (cid,fid,seltext,pos0,pos1,\
                                 owner,memo,date) values(?,?,?,?,?,?,?,?)",
@@ -4375,6 +4526,7 @@ class DialogCodeText(QtWidgets.QWidget):
         if self.edit_original_source is None:
             print("Should not occur")
             return
+        self.search_cache = None
         cursor = self.app.conn.cursor()
         cursor.execute("update source set fulltext=? where id=?",
                        [self.edit_original_source, self.edit_original_source_id])
@@ -4392,6 +4544,8 @@ class DialogCodeText(QtWidgets.QWidget):
         for ca in self.edit_original_case_assignment:
             cursor.execute("update case_text set pos0=?, pos1=? where caseid=?",
                            [ca[1], ca[2], ca[0]])
+        if self.file_ is not None and self.file_['id'] == self.edit_original_source_id:
+            self.file_['fulltext'] = self.edit_original_source
         self.clear_edit_variables()
         self.ui.textEdit.installEventFilter(self.eventFilterTT)
         self.annotations = self.app.get_annotations()
@@ -4399,8 +4553,8 @@ class DialogCodeText(QtWidgets.QWidget):
         self.update_file_tooltip()
         self.highlight()
         text_cursor = self.ui.textEdit.textCursor()
-        if self.edit_pos > len(self.ui.textEdit.toPlainText()):
-            self.edit_pos = len(self.ui.textEdit.toPlainText()) - 1
+        if self.edit_pos > self.text_edit_length():
+            self.edit_pos = self.text_edit_length() - 1
         text_cursor.setPosition(self.edit_pos, QtGui.QTextCursor.MoveMode.MoveAnchor)
         self.ui.textEdit.setTextCursor(text_cursor)
         msg = _("Text reverted to prior to edit")
@@ -4515,11 +4669,12 @@ class DialogCodeText(QtWidgets.QWidget):
             self.text = self.ui.textEdit.toPlainText()
             self.file_['fulltext'] = self.text
             self.file_['end'] = len(self.text)
+            self.search_cache = None
             cur = self.app.conn.cursor()
             cur.execute("update source set fulltext=? where id=?", (self.text, self.file_['id']))
             self.app.conn.commit()
-            for item in self.code_deletions:
-                cur.execute(item)
+            for sql, values in self.code_deletions:
+                cur.execute(sql, values)
             self.app.conn.commit()
             self.code_deletions = []
             self.ed_update_codings()
@@ -4539,8 +4694,8 @@ class DialogCodeText(QtWidgets.QWidget):
         self.update_file_tooltip()
         self.highlight()
         text_cursor = self.ui.textEdit.textCursor()
-        if self.edit_pos > len(self.ui.textEdit.toPlainText()):
-            self.edit_pos = len(self.ui.textEdit.toPlainText()) - 1
+        if self.edit_pos > self.text_edit_length():
+            self.edit_pos = self.text_edit_length() - 1
         text_cursor.setPosition(self.edit_pos, QtGui.QTextCursor.MoveMode.MoveAnchor)
         self.ui.textEdit.setTextCursor(text_cursor)
 
@@ -4566,8 +4721,11 @@ class DialogCodeText(QtWidgets.QWidget):
             return
 
         self.text = self.ui.textEdit.toPlainText()
-        diff = diff_match_patch.diff_match_patch()
-        diff_list = diff.diff_main(self.prev_text, self.text)
+        # One matcher is reused for every edit. diff_main strips the common prefix and suffix before diffing
+        if self.diff_matcher is None:
+            import diff_match_patch
+            self.diff_matcher = diff_match_patch.diff_match_patch()
+        diff_list = self.diff_matcher.diff_main(self.prev_text, self.text)
         # print(diff_list)
         extending = True
         preceding_pos = 0
@@ -4669,12 +4827,12 @@ class DialogCodeText(QtWidgets.QWidget):
                         c['newpos0'] = 0
                     c['newpos1'] -= chars_len
                     changed = True
-                    self.code_deletions.append(f"delete from code_text where ctid={c['ctid']}")
+                    self.code_deletions.append(("delete from code_text where ctid=?", [c['ctid']]))
                     c['newpos0'] = None
                 if c['newpos0'] is not None and not changed and c['newpos0'] < preceding_pos <= c['newpos1']:
                     c['newpos1'] -= chars_len
                     if c['newpos1'] < c['newpos0']:
-                        self.code_deletions.append(f"delete from code_text where ctid={c['ctid']}")
+                        self.code_deletions.append(("delete from code_text where ctid=?", [c['ctid']]))
                         c['newpos0'] = None
 
             for c in self.ed_annotations:
@@ -4692,12 +4850,12 @@ class DialogCodeText(QtWidgets.QWidget):
                         c['newpos0'] -= chars_len
                         c['newpos1'] -= chars_len
                         changed = True
-                        self.code_deletions.append(f"delete from annotations where anid={c['anid']}")
+                        self.code_deletions.append(("delete from annotation where anid=?", [c['anid']]))
                         c['newpos0'] = None
                 if c['newpos0'] is not None and not changed and c['newpos0'] < preceding_pos <= c['newpos1']:
                     c['newpos1'] -= chars_len
                     if c['newpos1'] < c['newpos0']:
-                        self.code_deletions.append(f"delete from annotation where anid={c['anid']}")
+                        self.code_deletions.append(("delete from annotation where anid=?", [c['anid']]))
                         c['newpos0'] = None
 
             for c in self.ed_casetext:
@@ -4717,12 +4875,12 @@ class DialogCodeText(QtWidgets.QWidget):
                         c['newpos0'] = 0
                     c['newpos1'] -= chars_len
                     changed = True
-                    self.code_deletions.append(f"delete from case_text where id={c['id']}")
+                    self.code_deletions.append(("delete from case_text where id=?", [c['id']]))
                     c['newpos0'] = None
                 if c['newpos0'] is not None and not changed and c['newpos0'] < preceding_pos <= c['newpos1']:
                     c['newpos1'] -= chars_len
                     if c['newpos1'] < c['newpos0']:
-                        self.code_deletions.append(f"delete from case_text where id={c['id']}")
+                        self.code_deletions.append(("delete from case_text where id=?", [c['id']]))
                         c['newpos0'] = None
         self.ed_highlight()
         self.prev_text = copy(self.text)
@@ -4938,7 +5096,7 @@ class DialogCodeText(QtWidgets.QWidget):
         format_.setFontPointSize(self.app.settings['docfontsize'])
         cursor = self.ui.textEdit.textCursor()
         cursor.setPosition(0, QtGui.QTextCursor.MoveMode.MoveAnchor)
-        cursor.setPosition(len(self.ui.textEdit.toPlainText()), QtGui.QTextCursor.MoveMode.KeepAnchor)
+        cursor.setPosition(self.text_edit_length(), QtGui.QTextCursor.MoveMode.KeepAnchor)
         cursor.setCharFormat(format_)
         self.ui.textEdit.blockSignals(False)
 
@@ -5017,6 +5175,8 @@ class DialogCodeText(QtWidgets.QWidget):
         """Will be called when the user changes between the tabs "documents" and
         "AI assistance"
         """
+        if self.ui.tabWidget.currentIndex() == 1:
+            self.init_ai_search_ui()
         self.fill_code_counts_in_tree()
 
     def ai_search_clicked(self):
@@ -5047,13 +5207,14 @@ class DialogCodeText(QtWidgets.QWidget):
         if code_item is None:  # nothing selected
             selected_id = -1
             selected_is_code = False
-        elif code_item.text(1)[0:3] == 'cat':  # category selected
-            selected_id = int(code_item.text(1).split(':')[1])
+        elif tree_item_id(code_item)[0] == 'catid':  # category selected
+            selected_id = tree_item_id(code_item)[1]
             selected_is_code = False
         else:  # code selected
-            selected_id = int(code_item.text(1).split(':')[1])
+            selected_id = tree_item_id(code_item)[1]
             selected_is_code = True
 
+        from .ai_search_dialog import DialogAiSearch
         ui = DialogAiSearch(self.app, 'search', selected_id, selected_is_code, self.tree_sort_option)
         ret = ui.exec()
         if ret == QtWidgets.QDialog.DialogCode.Accepted:
@@ -5432,6 +5593,7 @@ class ToolTipEventFilter(QtCore.QObject):
 
     codes = None
     code_text = None
+    code_text_pos0_index = ([], [], 0)  # Pos0 index of code_text, from index_by_pos0
     annotations = None
     file_id = None
     offset = 0
@@ -5455,11 +5617,21 @@ class ToolTipEventFilter(QtCore.QObject):
         self.annotations = annotations
         self.file_id = file_['id']
         self.offset = file_['start']
+        self.index_code_text()
+        codes_by_cid = {c['cid']: c for c in codes}
         for item in self.code_text:
-            for c in self.codes:
-                if item['cid'] == c['cid']:
-                    item['name'] = c['name']
-                    item['color'] = c['color']
+            code_ = codes_by_cid.get(item['cid'])
+            if code_ is not None:
+                item['name'] = code_['name']
+                item['color'] = code_['color']
+
+    def index_code_text(self):
+        """ Index code_text by pos0, for codes_at_position.
+        Called by: set_codes_and_annotations, DialogCodeText.update_resized_code """
+
+        if self.code_text is None:
+            return
+        self.code_text_pos0_index = index_by_pos0(self.code_text)
 
     def eventFilter(self, receiver, event):
         # QtGui.QToolTip.showText(QtGui.QCursor.pos(), tip)
@@ -5474,9 +5646,8 @@ class ToolTipEventFilter(QtCore.QObject):
             if self.code_text is None:
                 # Call Base Class Method to Continue Normal Event Processing
                 return super(ToolTipEventFilter, self).eventFilter(receiver, event)
-            for item in self.code_text:
-                if item['pos0'] - self.offset <= pos <= item['pos1'] - self.offset and \
-                        item['seltext'] is not None:
+            for item in self.codes_at_position(pos + self.offset):
+                if item['seltext'] is not None:
                     seltext = item['seltext']
                     seltext = seltext.replace("\n", "")
                     seltext = seltext.replace("\r", "")
@@ -5524,8 +5695,18 @@ class ToolTipEventFilter(QtCore.QObject):
         # Call Base Class Method to Continue Normal Event Processing
         return super(ToolTipEventFilter, self).eventFilter(receiver, event)
 
+    def codes_at_position(self, pos):
+        """ Get the coded texts that contain this position, see codings_at_position.
+        param: pos : Integer position in the full text
+        returns: List of code_text dictionaries, in code_text order
+        """
+
+        return codings_at_position(self.code_text, self.code_text_pos0_index, pos)
+
 
 # see https://www.freeformatter.com/html-entities.html
 entities = {"&": "&amp;", '"': '&quot;', "'": "&#39;", "<": "&lt;", ">": "&gt;", "–": "&ndash;", "—": "&mdash;",
             "€": "&euro;", "‘": "&lsquo;", "’": "&rsquo;", "“": "&ldquo;", "”": "&rdquo;", "…": "&hellip;",
             "™": "&trade;", "£": "&pound;"}
+# For str.translate of plain text to html, also converting line endings
+html_entities_table = str.maketrans({**entities, "\n": "<br />\n"})
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from types import SimpleNamespace
+import re
+
+from qualcoder.code_text import DialogCodeText, codings_at_position, index_by_pos0
+
+
+class TestCodeTextSearch(TestCase):
+    """ Testing the DialogCodeText text search helpers.
+    Search keys are tuples of search term, re flags, all files boolean and
+    a tuple of file id, start and end of the loaded text, or None for all files.
+    """
+
+    def extends_last_search(self, last_key, search_key):
+        dialog = SimpleNamespace(search_cache=(last_key, []))
+        return DialogCodeText.search_extends_last_search(dialog, search_key)
+
+    def test_search_extends_last_search(self):
+        self.assertTrue(self.extends_last_search(("abc", 0, False, (1, 0, 100)), ("abcd", 0, False, (1, 0, 100))))
+        # Not an extension of the last term
+        self.assertFalse(self.extends_last_search(("abc", 0, False, (1, 0, 100)), ("abd", 0, False, (1, 0, 100))))
+        # Different search options or file
+        self.assertFalse(self.extends_last_search(("abc", 0, False, (1, 0, 100)),
+                                                  ("abcd", re.IGNORECASE, False, (1, 0, 100))))
+        self.assertFalse(self.extends_last_search(("abc", 0, False, (1, 0, 100)), ("abcd", 0, False, (2, 0, 100))))
+        # Regex special characters and terms that can overlap themselves
+        self.assertFalse(self.extends_last_search(("abc", 0, False, (1, 0, 100)), ("abc.", 0, False, (1, 0, 100))))
+        self.assertFalse(self.extends_last_search(("aa", 0, False, (1, 0, 100)), ("aab", 0, False, (1, 0, 100))))
+        # No last search
+        dialog = SimpleNamespace(search_cache=None)
+        self.assertFalse(DialogCodeText.search_extends_last_search(dialog, ("abcd", 0, False, (1, 0, 100))))
+
+    def test_search_extends_last_search_other_text_section(self):
+        """ After loading another part of the same file, the last match positions are for other text. """
+
+        self.assertFalse(self.extends_last_search(("abc", 0, False, (1, 0, 100)),
+                                                  ("abcd", 0, False, (1, 100, 200))))
+
+    def test_search_text_matches(self):
+        text_ = "abc xabc ABC abcabc"
+        # Plain text, case-sensitive
+        self.assertEqual(DialogCodeText.search_text_matches(re.compile("abc"), text_),
+                         [(0, 3), (5, 3), (13, 3), (16, 3)])
+        # Case-insensitive
+        self.assertEqual(DialogCodeText.search_text_matches(re.compile("abc", re.IGNORECASE), text_),
+                         [(0, 3), (5, 3), (9, 3), (13, 3), (16, 3)])
+        # Regex
+        self.assertEqual(DialogCodeText.search_text_matches(re.compile("x?abc"), text_),
+                         [(0, 3), (4, 4), (13, 3), (16, 3)])
+        # Non-overlapping matches
+        self.assertEqual(DialogCodeText.search_text_matches(re.compile("aa"), "aaaa"), [(0, 2), (2, 2)])
+        self.assertEqual(DialogCodeText.search_text_matches(re.compile("zz"), text_), [])
+
+
+class TestCodeTextPos0Index(TestCase):
+    """ Testing the pos0 index used to find the coded texts at a text position. """
+
+    def test_codings_at_position(self):
+        code_text = [{'pos0': 5, 'pos1': 9}, {'pos0': 0, 'pos1': 20}, {'pos0': 10, 'pos1': 12}]
+        pos0_index = index_by_pos0(code_text)
+        self.assertEqual(pos0_index, ([1, 0, 2], [0, 5, 10], 20))
+        # Results are in code_text order
+        self.assertEqual(codings_at_position(code_text, pos0_index, 8), [code_text[0], code_text[1]])
+        self.assertEqual(codings_at_position(code_text, pos0_index, 11), [code_text[1], code_text[2]])
+        # Start and end positions are included
+        self.assertEqual(codings_at_position(code_text, pos0_index, 12), [code_text[1], code_text[2]])
+        self.assertEqual(codings_at_position(code_text, pos0_index, 25), [])
+        self.assertEqual(codings_at_position([], index_by_pos0([]), 3), [])